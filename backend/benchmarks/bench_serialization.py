@@ -0,0 +1,69 @@
+"""Micro-benchmark: serialising 10k product rows, before and after orjson.
+
+"before" mimics the old response path: RealDictCursor rows copied with
+``dict(row)`` and encoded by FastAPI's ``jsonable_encoder`` + ``json.dumps``.
+"after" is the current path: tuple rows zipped once with the column list
+and encoded by ``responses.dumps`` (orjson with a Decimal hook).
+
+Run from ``backend/``:  python benchmarks/bench_serialization.py
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from responses import dumps  # noqa: E402
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:  # still gives a stdlib baseline without FastAPI installed
+    jsonable_encoder = None
+
+ROWS = 10_000
+COLUMNS = [
+    "id", "name", "brand", "price", "unit_price", "unit_label", "size", "promo", "market",
+    "quantity", "quantity_unit", "price_per_unit", "created_at", "updated_at",
+]
+
+
+def make_rows():
+    now = datetime(2026, 1, 1)
+    return [
+        (
+            i, f"Crème fraîche épaisse {i}", "Président", Decimal("1.99"), Decimal("9.95"),
+            "€/kg", "20cl", None if i % 3 else "2+1 offert", "franprix",
+            Decimal("0.2000"), "l", Decimal("9.9500"), now, now + timedelta(days=i % 30),
+        )
+        for i in range(ROWS)
+    ]
+
+
+def before(rows):
+    # RealDictCursor builds one dict per row, the handler then copied it again
+    products = [dict(dict(zip(COLUMNS, row))) for row in rows]
+    payload = {"products": products}
+    if jsonable_encoder is not None:
+        return json.dumps(jsonable_encoder(payload)).encode("utf-8")
+    return json.dumps(payload, default=str).encode("utf-8")
+
+
+def after(rows):
+    products = [dict(zip(COLUMNS, row)) for row in rows]
+    return dumps({"products": products})
+
+
+def main():
+    rows = make_rows()
+    baseline = "jsonable_encoder + json" if jsonable_encoder else "json (FastAPI not installed)"
+    for label, func in ((f"before: {baseline}", before), ("after: orjson", after)):
+        runs = 5
+        best = min(timeit.repeat(lambda: func(rows), number=1, repeat=runs))
+        print(f"{label:45s} {best * 1000:8.1f} ms per {ROWS:,} products")
+
+
+if __name__ == "__main__":
+    main()
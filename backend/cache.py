@@ -0,0 +1,136 @@
+"""Caches keyed on the catalog data version.
+
+``scripts/load_data.py`` bumps the single-row ``data_version`` table after
+every load that changed something. That counter is the invalidation hook:
+anything computed under an older version is stale, and versions are part
+of every cache key below.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import psycopg2
+from cachetools import TTLCache
+from fastapi import Request, Response
+
+from database import get_db_connection
+from responses import dumps
+
+# How stale the API may be after a load, in exchange for not asking Postgres
+# for the version on every request
+DATA_VERSION_POLL_SECS = float(os.getenv('DATA_VERSION_POLL_SECS', '5'))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '512'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+
+
+def get_data_version(conn):
+    """Current catalog version, 0 if nothing was ever loaded"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT version FROM data_version")
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+class DataVersion:
+    """Process-wide view of ``data_version``, re-read at most every ``poll_interval`` seconds
+
+    The lock only guards the cached value; the query runs outside it, and
+    while one thread refreshes the others keep serving the previous
+    version instead of queueing behind it for a pool connection.
+    """
+
+    def __init__(self, poll_interval=DATA_VERSION_POLL_SECS):
+        self.poll_interval = poll_interval
+        self._value = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def current(self, conn=None):
+        """Pass ``conn`` when the caller already holds one, so we never wait on the pool twice"""
+        with self._lock:
+            if self._value is not None and (
+                self._refreshing or time.monotonic() - self._checked_at < self.poll_interval
+            ):
+                return self._value
+            self._refreshing = True
+        try:
+            if conn is not None:
+                value = get_data_version(conn)
+            else:
+                with get_db_connection() as conn:
+                    value = get_data_version(conn)
+        finally:
+            with self._lock:
+                self._refreshing = False
+        with self._lock:
+            self._value = value
+            self._checked_at = time.monotonic()
+        return value
+
+
+data_version = DataVersion()
+
+
+class VersionedCache:
+    """Thread-safe memo table that empties itself when the data version moves"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._version = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, version, key, compute):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            if version == self._version and len(self._entries) < self.maxsize:
+                self._entries[key] = value
+        return value
+
+
+class ResponseCache:
+    """LRU + TTL cache of serialised JSON bodies and their ETags"""
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        body = dumps(compute())
+        entry = (f'"{hashlib.md5(body).hexdigest()}"', body)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+
+response_cache = ResponseCache()
+
+
+def cached_json(request: Request, compute):
+    """Serve ``compute()`` from the response cache, honouring If-None-Match
+
+    ``compute`` is only called (and Postgres only touched) on a miss; the key
+    is the route, its query string and the data version.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), data_version.current())
+    etag, body = response_cache.get_or_compute(key, compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
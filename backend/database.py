@@ -1,7 +1,11 @@
 import os
-import psycopg2
+import threading
+import time
 from contextlib import contextmanager
 
+import psycopg2
+from psycopg2 import pool
+
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
     'database': os.getenv('DB_NAME', 'scraped_data'),
@@ -9,17 +13,109 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'mypassword')
 }
 
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX', '20')),
+    # Seconds a request waits for a free connection before giving up
+    'acquire_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    # Connections idle for longer than this are pinged before being handed out
+    'healthcheck_after': float(os.getenv('DB_POOL_HEALTHCHECK_SECS', '30')),
+    'statement_timeout_ms': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000')),
+}
+
+_pool = None
+_slots = None
+_last_used = {}
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    """Create the shared connection pool (idempotent)"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = pool.ThreadedConnectionPool(
+                POOL_CONFIG['min_size'],
+                POOL_CONFIG['max_size'],
+                options=f"-c statement_timeout={POOL_CONFIG['statement_timeout_ms']}",
+                **DB_CONFIG
+            )
+            # ThreadedConnectionPool raises instead of waiting when exhausted,
+            # so callers queue on a semaphore sized to the pool instead.
+            _slots = threading.BoundedSemaphore(POOL_CONFIG['max_size'])
+    return _pool
+
+
+def close_pool():
+    """Close every pooled connection"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _slots = None
+            _last_used.clear()
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    idle = time.monotonic() - _last_used.get(id(conn), 0)
+    if idle < POOL_CONFIG['healthcheck_after']:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(db_pool):
+    conn = db_pool.getconn()
+    if not _is_healthy(conn):
+        db_pool.putconn(conn, close=True)
+        conn = db_pool.getconn()
+    return conn
+
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
+    """Context manager borrowing a connection from the pool"""
+    db_pool = init_pool()
+    slots = _slots
+    if not slots.acquire(timeout=POOL_CONFIG['acquire_timeout']):
+        raise pool.PoolError("Timed out waiting for a database connection")
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = _checkout(db_pool)
         yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
     finally:
         if conn:
-            conn.close()
+            if not conn.closed:
+                # End any transaction left open by read-only queries
+                conn.rollback()
+            _last_used[id(conn)] = time.monotonic()
+            db_pool.putconn(conn, close=bool(conn.closed))
+        slots.release()
+
+
+def get_db():
+    """FastAPI dependency yielding a pooled connection"""
+    with get_db_connection() as conn:
+        yield conn
+
+
+def fetch_dicts(cursor):
+    """Remaining rows of the last query as dicts, built straight from tuples"""
+    columns = [column.name for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def fetch_dict(cursor):
+    """Next row of the last query as a dict, or None"""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip((column.name for column in cursor.description), row))
@@ -0,0 +1,117 @@
+"""Streaming exports of the product catalog.
+
+Rows are read through a server-side (named) cursor in ``EXPORT_BATCH_SIZE``
+chunks and written to the client chunk by chunk, so backend memory stays
+flat however large the catalog is. The generators borrow their own pooled
+connection because they outlive the request handler that returns them.
+"""
+import csv
+import io
+import os
+import tempfile
+
+from database import get_db_connection
+from responses import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only the Arrow/Parquet exports need it
+    pa = None
+    pq = None
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
+
+# Columns of the analyst export, with the SQL cast that gives every batch
+# the same Arrow type
+EXPORT_COLUMNS = [
+    ("id", "id", "int64"),
+    ("name", "name", "string"),
+    ("brand", "brand", "string"),
+    ("market", "market", "string"),
+    ("price", "price::float8", "float64"),
+    ("unit_price", "unit_price::float8", "float64"),
+    ("unit_label", "unit_label", "string"),
+    ("size", "size", "string"),
+    ("promo", "promo", "string"),
+    ("quantity", "quantity::float8", "float64"),
+    ("quantity_unit", "quantity_unit", "string"),
+    ("price_per_unit", "price_per_unit::float8", "float64"),
+    ("updated_at", "updated_at", "timestamp"),
+]
+
+
+def iter_batches(query, params=None):
+    """Yield lists of row tuples from a server-side cursor"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(name="catalog_export")
+        cursor.itersize = EXPORT_BATCH_SIZE
+        cursor.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def ndjson_stream(query, columns):
+    for rows in iter_batches(query):
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def csv_stream(query, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in iter_batches(query):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _arrow_schema():
+    types = {"int64": pa.int64(), "string": pa.string(), "float64": pa.float64(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[arrow_type]) for name, _, arrow_type in EXPORT_COLUMNS])
+
+
+def _export_query():
+    return "SELECT {} FROM products ORDER BY id".format(", ".join(sql for _, sql, _ in EXPORT_COLUMNS))
+
+
+def _record_batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def arrow_stream():
+    """Arrow IPC stream, written and sent one record batch at a time"""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in iter_batches(_export_query()):
+            writer.write_batch(_record_batch(schema, rows))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def parquet_stream(chunk_size=1 << 20):
+    """Parquet needs its footer written last, so spool to disk and stream the file"""
+    schema = _arrow_schema()
+    with tempfile.TemporaryFile() as spool:
+        with pq.ParquetWriter(spool, schema) as writer:
+            for rows in iter_batches(_export_query()):
+                writer.write_batch(_record_batch(schema, rows))
+        spool.seek(0)
+        while chunk := spool.read(chunk_size):
+            yield chunk
@@ -1,12 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 #from backend.routers import products
 #from backend.database import get_db_connection
-from routers import products, brands
-from database import get_db_connection
+from routers import products, brands, prices, compare, recipes
+from database import init_pool, close_pool, get_db_connection
+from responses import ORJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_pool()
+    # Build the recipe catalog index before the first request needs it
+    with get_db_connection() as conn:
+        recipes.catalog.refresh(conn)
+    yield
+    close_pool()
+
 
-app = FastAPI(title="Product API", description="API for scraped product data")
+app = FastAPI(
+    title="Product API",
+    description="API for scraped product data",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 app.include_router(products.router)
 app.include_router(brands.router)
+app.include_router(prices.router)
+app.include_router(compare.router)
+app.include_router(recipes.router)
 @app.get("/")
 async def root():
     return {"message": "Product API is working!"}
@@ -0,0 +1,135 @@
+"""Response models.
+
+They document the API schema. Handlers return ``json_response`` objects, so
+FastAPI does not validate each row against these models at request time.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Product(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: int
+    name: Optional[str] = None
+    brand: Optional[str] = None
+    price: Optional[float] = None
+    unit_price: Optional[float] = None
+    unit_label: Optional[str] = None
+    size: Optional[str] = None
+    promo: Optional[str] = None
+    market: Optional[str] = None
+    quantity: Optional[float] = None
+    quantity_unit: Optional[str] = None
+    price_per_unit: Optional[float] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ProductName(BaseModel):
+    id: int
+    name: Optional[str] = None
+
+
+class ProductNames(BaseModel):
+    products: List[ProductName]
+
+
+class ProductPage(BaseModel):
+    products: List[Product]
+    total: int
+    limit: int
+    offset: int
+    next_cursor: Optional[str] = None
+
+
+class ProductDetail(BaseModel):
+    product: Product
+
+
+class SearchResults(BaseModel):
+    products: List[Product]
+    query: str
+    limit: int
+    offset: int
+
+
+class UnitPriceResults(BaseModel):
+    products: List[Product]
+    unit: str
+    limit: int
+    offset: int
+
+
+class BrandName(BaseModel):
+    brand: Optional[str] = None
+
+
+class BrandNames(BaseModel):
+    brands: List[BrandName]
+
+
+class BrandStats(BaseModel):
+    brand: str
+    market: str
+    product_count: int
+    min_price: Optional[float] = None
+    median_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+class TopBrands(BaseModel):
+    brands: List[BrandStats]
+    total_brands: int
+    market: str
+
+
+class BrandStatsByMarket(BaseModel):
+    brand: str
+    stats: List[BrandStats]
+
+
+class PriceObservation(BaseModel):
+    observed_at: datetime
+    market: str
+    price: Optional[float] = None
+    unit_price: Optional[float] = None
+    promo: Optional[str] = None
+
+
+class PriceHistory(BaseModel):
+    product_id: int
+    days: int
+    history: List[PriceObservation]
+
+
+class PriceStatsValues(BaseModel):
+    observations: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    first_observed_at: Optional[datetime] = None
+    last_observed_at: Optional[datetime] = None
+
+
+class PriceStats(BaseModel):
+    product_id: int
+    days: int
+    stats: PriceStatsValues
+
+
+class MatchGroup(BaseModel):
+    id: int
+    label: str
+    match_key: str
+    market_count: int
+    created_at: Optional[datetime] = None
+
+
+class Comparison(BaseModel):
+    query: Optional[str] = None
+    group: MatchGroup
+    products: List[Product]
+    cheapest: Optional[Product] = None
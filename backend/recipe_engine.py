@@ -0,0 +1,266 @@
+"""Recipe parsing and cheapest-basket optimisation.
+
+The product catalog is held in memory as a token -> product postings index
+(``CatalogIndex``), built once at startup and rebuilt only when the loader
+bumps ``data_version``. Optimising a recipe is then a few set intersections
+per ingredient and never touches the ``products`` table.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from cache import data_version
+
+STOPWORDS = {
+    'a', 'au', 'aux', 'avec', 'de', 'des', 'du', 'en', 'et', 'la', 'le', 'les',
+    'l', 'd', 'pour', 'sans', 'sur', 'un', 'une',
+}
+
+# Recipe units -> (canonical unit, factor). Spoon-style units carry no usable
+# quantity and just mean "one pack".
+_UNITS = {
+    'kg': ('kg', 1), 'kilo': ('kg', 1), 'kilos': ('kg', 1),
+    'g': ('kg', 0.001), 'gr': ('kg', 0.001), 'gramme': ('kg', 0.001), 'grammes': ('kg', 0.001),
+    'mg': ('kg', 0.000001),
+    'l': ('l', 1), 'litre': ('l', 1), 'litres': ('l', 1),
+    'cl': ('l', 0.01), 'ml': ('l', 0.001), 'dl': ('l', 0.1),
+}
+_VAGUE_UNITS = (
+    r"cuilleres? a soupe|cuilleres? a cafe|c\.? ?a\.? ?s\.?|c\.? ?a\.? ?c\.?|"
+    r"pincees?|sachets?|tranches?|gousses?|brins?|verres?|tasses?|boites?|pots?"
+)
+_INGREDIENT_RE = re.compile(
+    r"^\s*(?:[-*•]\s*)?"
+    r"(?P<quantity>\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?)?\s*"
+    rf"(?P<unit>{'|'.join(sorted(_UNITS, key=len, reverse=True))}|{_VAGUE_UNITS})?\.?\s+"
+    r"(?:(?:de|d'|des|du)\s*)?"
+    r"(?P<name>.+?)\s*$"
+)
+
+
+def normalize(text):
+    """Accent-free, lower-case text"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Content words of ``text``, crudely singularised so "tomates" finds "tomate" """
+    tokens = set()
+    for token in re.split(r"[^a-z0-9]+", normalize(text)):
+        if len(token) < 2 or token in STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 3 and token[-1] in 'sx':
+            token = token[:-1]
+        tokens.add(token)
+    return tokens
+
+
+def _parse_quantity(text):
+    """'1,5' -> 1.5, '1/2' -> 0.5; None for a zero denominator"""
+    if '/' in text:
+        numerator, denominator = text.split('/')
+        if float(denominator) == 0:
+            return None
+        return float(numerator.replace(',', '.')) / float(denominator)
+    return float(text.replace(',', '.'))
+
+
+@dataclass
+class Ingredient:
+    name: str
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+    tokens: frozenset = field(default_factory=frozenset)
+
+
+def parse_ingredient(line):
+    """'200 g de farine' -> Ingredient('farine', 0.2, 'kg'); None for blank lines
+
+    >>> def parsed(line):
+    ...     ingredient = parse_ingredient(line)
+    ...     return ingredient.name, ingredient.quantity, ingredient.unit
+    >>> parsed('2 litres de lait')
+    ('lait', 2.0, 'l')
+    >>> parsed('1 kilo de pommes')
+    ('pommes', 1.0, 'kg')
+    >>> parsed('500 grammes de farine')
+    ('farine', 0.5, 'kg')
+    >>> parsed('1/2 litre de creme')
+    ('creme', 0.5, 'l')
+    >>> parsed('1/0 kg de sel')
+    ('sel', None, 'kg')
+    """
+    line = normalize(line).strip()
+    if not line:
+        return None
+    match = _INGREDIENT_RE.match(line)
+    if not match or not match.group('name'):
+        name, quantity, unit = line, None, None
+    else:
+        name = match.group('name')
+        quantity = _parse_quantity(match.group('quantity')) if match.group('quantity') else None
+        unit = None
+        if match.group('unit') in _UNITS:
+            unit, factor = _UNITS[match.group('unit')]
+            quantity = quantity * factor if quantity is not None else None
+        elif match.group('unit'):
+            quantity = None
+        elif quantity is not None:
+            unit = 'unit'
+    tokens = frozenset(tokenize(name))
+    if not tokens:
+        return None
+    return Ingredient(name=name, quantity=quantity, unit=unit, tokens=tokens)
+
+
+def parse_recipe(text):
+    """One ingredient per non-blank line"""
+    ingredients = []
+    for line in text.splitlines():
+        ingredient = parse_ingredient(line)
+        if ingredient:
+            ingredients.append(ingredient)
+    return ingredients
+
+
+class CatalogIndex:
+    """In-memory inverted index over priced products, refreshed per data version"""
+
+    def __init__(self):
+        self.version = None
+        self.products = []
+        self.postings: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, conn):
+        """Rebuild from the database if the loader has published new data"""
+        version = data_version.current(conn)
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, name, brand, market, price, quantity, quantity_unit, price_per_unit
+                    FROM products
+                    WHERE name IS NOT NULL AND price IS NOT NULL
+                """)
+                rows = cursor.fetchall()
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+                rows = []
+
+            products = []
+            postings = defaultdict(set)
+            for product_id, name, brand, market, price, quantity, quantity_unit, price_per_unit in rows:
+                index = len(products)
+                products.append({
+                    'id': product_id,
+                    'name': name,
+                    'brand': brand,
+                    'market': market,
+                    'price': float(price),
+                    'quantity': float(quantity) if quantity is not None else None,
+                    'quantity_unit': quantity_unit,
+                    'price_per_unit': float(price_per_unit) if price_per_unit is not None else None,
+                })
+                for token in tokenize(name):
+                    postings[token].add(index)
+
+            self.products = products
+            self.postings = dict(postings)
+            self.version = version
+
+    def candidates(self, ingredient):
+        """Products whose name contains every ingredient token, else the rarest known one"""
+        postings = [self.postings[token] for token in ingredient.tokens if token in self.postings]
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        matched = set.intersection(*postings) if len(postings) == len(ingredient.tokens) else set()
+        return matched or postings[0]
+
+
+def pack_cost(ingredient, product):
+    """Cost of enough packs of ``product`` to cover ``ingredient``"""
+    if (
+        ingredient.quantity is not None
+        and product['quantity']
+        and ingredient.unit == product['quantity_unit']
+    ):
+        packs = max(1, math.ceil(ingredient.quantity / product['quantity'] - 1e-9))
+    else:
+        packs = 1
+    return packs, round(packs * product['price'], 2)
+
+
+def _line(ingredient, product, packs, cost):
+    return {
+        'ingredient': ingredient.name,
+        'product': product,
+        'packs': packs,
+        'cost': cost,
+    }
+
+
+def optimize(catalog: CatalogIndex, ingredients: List[Ingredient]):
+    """Cheapest cross-store basket plus the cost of buying everything in each store"""
+    # best[i][market] = (cost, packs, product) for ingredient i
+    best = []
+    for ingredient in ingredients:
+        per_market = {}
+        for index in catalog.candidates(ingredient):
+            product = catalog.products[index]
+            packs, cost = pack_cost(ingredient, product)
+            current = per_market.get(product['market'])
+            if current is None or cost < current[0]:
+                per_market[product['market']] = (cost, packs, product)
+        best.append(per_market)
+
+    cross_store = []
+    missing = []
+    for ingredient, per_market in zip(ingredients, best):
+        if not per_market:
+            missing.append(ingredient.name)
+            continue
+        cost, packs, product = min(per_market.values(), key=lambda option: option[0])
+        cross_store.append(_line(ingredient, product, packs, cost))
+
+    markets = sorted({market for per_market in best for market in per_market})
+    stores = []
+    for market in markets:
+        lines = []
+        store_missing = []
+        for ingredient, per_market in zip(ingredients, best):
+            if market in per_market:
+                cost, packs, product = per_market[market]
+                lines.append(_line(ingredient, product, packs, cost))
+            else:
+                store_missing.append(ingredient.name)
+        stores.append({
+            'market': market,
+            'total': round(sum(line['cost'] for line in lines), 2),
+            'items': lines,
+            'missing': store_missing,
+        })
+    # Complete baskets first, then cheapest
+    stores.sort(key=lambda store: (len(store['missing']), store['total']))
+
+    return {
+        'cross_store': {
+            'total': round(sum(line['cost'] for line in cross_store), 2),
+            'items': cross_store,
+            'missing': missing,
+        },
+        'best_store': stores[0] if stores else None,
+        'stores': stores,
+    }
@@ -0,0 +1,32 @@
+"""orjson-backed JSON responses.
+
+Handlers return ``json_response(payload)`` rather than a bare dict: FastAPI
+skips ``jsonable_encoder`` and response-model validation for Response
+objects, and orjson serialises datetimes natively. ``Decimal`` (every
+DECIMAL/NUMERIC column) is the one type it needs help with.
+"""
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, status_code=200, headers=None):
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -1,26 +1,84 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional
 import psycopg2
-from psycopg2.extras import RealDictCursor
 #from backend.database import get_db_connection
-from database import get_db_connection
+from cache import cached_json
+from database import fetch_dicts, get_db, get_db_connection
+from models import BrandNames, BrandStatsByMarket, TopBrands
 
 router = APIRouter(prefix="/brands", tags=["brands"])
-# ... rest of your routes
+# Handlers are plain ``def`` so FastAPI runs the blocking psycopg2 calls in its
+# threadpool instead of on the event loop.
 
 
 
 
-@router.get("/names")
-async def get_brand_names():
+@router.get("/names", response_model=BrandNames)
+def get_brand_names(request: Request):
     """Get all brand names"""
-    try:
+    def load():
         with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             cursor.execute("SELECT  distinct(brand) FROM products ORDER BY brand")
-            brands = cursor.fetchall()
-            return {"brands": [dict(brand) for brand in brands]}
+            return {"brands": fetch_dicts(cursor)}
+
+    try:
+        return cached_json(request, load)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/top", response_model=TopBrands)
+def get_top_brands(
+    request: Request,
+    market: str = "all",
+    limit: int = Query(5, ge=1, le=100)
+):
+    """Brands with the most products, from the precomputed brand_market_stats view
+
+    ``market=all`` ranks brands across every supermarket.
+    """
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # The rollup rows are labelled 'all' too; is_total tells them from a market of that name
+            is_total = market == "all"
+            cursor.execute("""
+                SELECT brand, market, product_count, min_price, median_price, max_price
+                FROM brand_market_stats
+                WHERE is_total = %s AND market = %s
+                ORDER BY product_count DESC, brand
+                LIMIT %s
+            """, (is_total, market, limit))
+            brands = fetch_dicts(cursor)
+            cursor.execute(
+                "SELECT COUNT(*) FROM brand_market_stats WHERE is_total = %s AND market = %s",
+                (is_total, market)
+            )
+            total = cursor.fetchone()[0]
+            return {"brands": brands, "total_brands": total, "market": market}
+
+    try:
+        return cached_json(request, load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@router.get("/stats", response_model=BrandStatsByMarket)
+def get_brand_stats(request: Request, brand: str):
+    """Product count and min/median/max price of a brand, per market and overall"""
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT brand, market, product_count, min_price, median_price, max_price
+                FROM brand_market_stats
+                WHERE brand = %s
+                ORDER BY is_total DESC, market
+            """, (brand,))
+            return {"brand": brand, "stats": fetch_dicts(cursor)}
+
+    try:
+        return cached_json(request, load)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
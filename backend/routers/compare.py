@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException
+from database import fetch_dict, fetch_dicts, get_db
+from models import Comparison
+from responses import json_response
+
+router = APIRouter(prefix="/compare", tags=["compare"])
+# Answers from the match index built offline by scripts/match_products.py;
+# nothing here does fuzzy matching across products at request time.
+
+
+def _group_products(cursor, group_id):
+    cursor.execute("""
+        SELECT p.*, m.score AS match_score
+        FROM product_matches m
+        JOIN products p ON p.id = m.product_id
+        WHERE m.group_id = %s
+        ORDER BY p.price NULLS LAST, p.market
+    """, (group_id,))
+    return fetch_dicts(cursor)
+
+
+def _comparison(cursor, group):
+    products = _group_products(cursor, group["id"])
+    priced = [product for product in products if product["price"] is not None]
+    return {
+        "group": group,
+        "products": products,
+        "cheapest": priced[0] if priced else None
+    }
+
+
+@router.get("/product/{product_id}", response_model=Comparison)
+def compare_product(product_id: int, conn=Depends(get_db)):
+    """Compare prices across stores for the group a product belongs to"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT g.*
+            FROM product_matches m
+            JOIN match_groups g ON g.id = m.group_id
+            WHERE m.product_id = %s
+        """, (product_id,))
+        group = fetch_dict(cursor)
+        if not group:
+            raise HTTPException(status_code=404, detail="Product not matched yet")
+        return json_response(_comparison(cursor, group))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/{product_name}", response_model=Comparison)
+def compare_prices(product_name: str, conn=Depends(get_db)):
+    """Compare prices across stores for a product name"""
+    try:
+        cursor = conn.cursor()
+        # Exact normalised-name hit first, then the closest group by trigrams
+        cursor.execute("""
+            SELECT * FROM match_groups
+            WHERE match_key = match_key(%s)
+            ORDER BY market_count DESC, id
+            LIMIT 1
+        """, (product_name,))
+        group = fetch_dict(cursor)
+        if not group:
+            cursor.execute("""
+                SELECT * FROM match_groups
+                WHERE match_key %% match_key(%(name)s)
+                ORDER BY similarity(match_key, match_key(%(name)s)) DESC, market_count DESC, id
+                LIMIT 1
+            """, {"name": product_name})
+            group = fetch_dict(cursor)
+        if not group:
+            raise HTTPException(status_code=404, detail="No matching product")
+        return json_response({"query": product_name, **_comparison(cursor, group)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
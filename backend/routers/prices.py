@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database import fetch_dict, fetch_dicts, get_db
+from models import PriceHistory, PriceStats
+from responses import json_response
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+# Reads price_observations, which is partitioned by month: the observed_at
+# window below lets Postgres prune every partition outside it.
+
+
+@router.get("/{product_id}/history", response_model=PriceHistory)
+def get_price_history(
+    product_id: int,
+    days: int = Query(365, ge=1, le=3650),
+    conn=Depends(get_db)
+):
+    """Price observations of a product over the last ``days`` days"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT observed_at, market, price, unit_price, promo
+            FROM price_observations
+            WHERE product_id = %s
+              AND observed_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+            ORDER BY observed_at
+        """, (product_id, days))
+        return json_response({
+            "product_id": product_id,
+            "days": days,
+            "history": fetch_dicts(cursor)
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/{product_id}/stats", response_model=PriceStats)
+def get_price_stats(
+    product_id: int,
+    days: int = Query(30, ge=1, le=3650),
+    conn=Depends(get_db)
+):
+    """Min, max and average price of a product over the last ``days`` days"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) AS observations,
+                   MIN(price) AS min_price,
+                   MAX(price) AS max_price,
+                   ROUND(AVG(price), 2) AS avg_price,
+                   MIN(observed_at) AS first_observed_at,
+                   MAX(observed_at) AS last_observed_at
+            FROM price_observations
+            WHERE product_id = %s
+              AND observed_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+        """, (product_id, days))
+        stats = fetch_dict(cursor)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    if not stats["observations"]:
+        raise HTTPException(status_code=404, detail="No price history for this product")
+    return json_response({"product_id": product_id, "days": days, "stats": stats})
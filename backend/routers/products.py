@@ -1,101 +1,246 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+import base64
+import binascii
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
 import psycopg2
-from psycopg2.extras import RealDictCursor
 #from backend.database import get_db_connection
-from database import get_db_connection
+from cache import VersionedCache, cached_json, data_version
+from database import fetch_dict, fetch_dicts, get_db, get_db_connection
+from export import arrow_stream, csv_stream, ndjson_stream, pa, parquet_stream
+from models import ProductDetail, ProductNames, ProductPage, SearchResults, UnitPriceResults
+from responses import json_response
+from search import build_search_query
 
 router = APIRouter(prefix="/products", tags=["products"])
-# ... rest of your routes
+_count_cache = VersionedCache()
+# Handlers are plain ``def`` so FastAPI runs the blocking psycopg2 calls in its
+# threadpool instead of on the event loop.
 
 
 
 
-@router.get("/names")
-async def get_product_names():
-    """Get all product names"""
-    try:
+@router.get("/names", response_model=ProductNames)
+def get_product_names(
+    request: Request,
+    format: Literal["json", "ndjson", "csv"] = "json"
+):
+    """Get all product names
+
+    ``format=ndjson`` or ``format=csv`` streams the rows from a server-side
+    cursor instead of building one JSON document.
+    """
+    query = "SELECT id, name FROM products ORDER BY name"
+    if format == "ndjson":
+        return StreamingResponse(ndjson_stream(query, ["id", "name"]), media_type="application/x-ndjson")
+    if format == "csv":
+        return StreamingResponse(
+            csv_stream(query, ["id", "name"]),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="product_names.csv"'}
+        )
+
+    def load():
         with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT id, name FROM products ORDER BY name")
-            products = cursor.fetchall()
-            return {"products": [dict(product) for product in products]}
+            cursor = conn.cursor()
+            cursor.execute(query)
+            products = fetch_dicts(cursor)
+            return {"products": products}
+
+    try:
+        return cached_json(request, load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/products")
-async def get_products(
+@router.get("/export")
+def export_products(format: Literal["parquet", "arrow"] = "parquet"):
+    """Bulk export of the whole catalog for analysis, as Parquet or an Arrow IPC stream"""
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed on this server")
+    if format == "arrow":
+        return StreamingResponse(
+            arrow_stream(),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": 'attachment; filename="products.arrows"'}
+        )
+    return StreamingResponse(
+        parquet_stream(),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": 'attachment; filename="products.parquet"'}
+    )
+
+@router.get("/products", response_model=ProductPage)
+def get_products(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    brand: Optional[str] = None
+    brand: Optional[str] = None,
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    conn=Depends(get_db)
 ):
-    """Get products with optional filtering and pagination"""
+    """Get products with optional filtering and pagination
+
+    Pass the ``next_cursor`` of a previous page as ``cursor`` to page by
+    keyset on ``(name, id)``; every page then costs the same. Products
+    without a name come last in both modes, ordered by ``id``. Without a
+    cursor the legacy ``offset`` paging is used.
+    """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Build query with optional brand filter
-            base_query = "SELECT * FROM products"
-            count_query = "SELECT COUNT(*) FROM products"
-            
-            if brand:
-                base_query += " WHERE brand ILIKE %s"
-                count_query += " WHERE brand ILIKE %s"
-                params = [f"%{brand}%"]
-            else:
-                params = []
-            
-            # Get total count
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
+        after = decode_cursor(page_cursor) if page_cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        cursor = conn.cursor()
             
-            # Get products with pagination
-            base_query += " ORDER BY name LIMIT %s OFFSET %s"
-            cursor.execute(base_query, params + [limit, offset])
-            products = cursor.fetchall()
+        # Build query with optional brand filter
+        conditions = []
+        params = []
+        if brand:
+            conditions.append("brand ILIKE %s")
+            params.append(f"%{brand}%")
+
+        total = _count_products(conn, brand, conditions, params)
+
+        if after is None:
+            products = _fetch_page(cursor, conditions, params, limit + 1, offset)
+        elif after[0] is not None:
+            # Rows without a name sort last; carry on into them once the named ones run out
+            products = _fetch_page(cursor, conditions + ["(name, id) > (%s, %s)"], params + list(after), limit + 1)
+            if len(products) <= limit:
+                products += _fetch_page(cursor, conditions + ["name IS NULL"], params, limit + 1 - len(products))
+        else:
+            products = _fetch_page(cursor, conditions + ["name IS NULL AND id > %s"], params + [after[1]], limit + 1)
+
+        # One extra row tells us if there is a next page
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            last = products[-1]
+            next_cursor = encode_cursor(last["name"], last["id"])
             
-            return {
-                "products": [dict(product) for product in products],
-                "total": total,
-                "limit": limit,
-                "offset": offset
-            }
+        return json_response({
+            "products": products,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/{product_id}")
-async def get_product(product_id: int):
-    """Get a specific product by ID"""
+
+def _fetch_page(cursor, conditions, params, limit, offset=0):
+    """Up to ``limit`` products matching ``conditions`` in (name, id) order, NULL names last"""
+    query = "SELECT * FROM products"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY name NULLS LAST, id LIMIT %s OFFSET %s"
+    cursor.execute(query, [*params, limit, offset])
+    return fetch_dicts(cursor)
+
+
+def encode_cursor(name, product_id):
+    """Opaque page token for the keyset position after (name, id)"""
+    raw = json.dumps([name, product_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token):
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-            product = cursor.fetchone()
-            
-            if not product:
-                raise HTTPException(status_code=404, detail="Product not found")
-            
-            return {"product": dict(product)}
-    except psycopg2.Error as e:
+        name, product_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, UnicodeError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    # name is None once paging has reached the products without a name
+    if not isinstance(name, (str, type(None))) or not isinstance(product_id, int):
+        raise ValueError(f"Invalid cursor: {token}")
+    return name, product_id
+
+
+def _count_products(conn, brand, conditions, params):
+    """Total matching rows, computed once per data version and filter"""
+    def count():
+        cursor = conn.cursor()
+        query = "SELECT COUNT(*) FROM products"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+    return _count_cache.get_or_compute(data_version.current(conn), brand, count)
+
+@router.get("/search", response_model=SearchResults)
+def search_products(
+    q: str = Query(..., min_length=2),
+    brand: Optional[str] = None,
+    market: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    conn=Depends(get_db)
+):
+    """Search products by name, most relevant first"""
+    try:
+        cursor = conn.cursor()
+        sql, params = build_search_query(q, brand=brand, market=market, limit=limit, offset=offset)
+        cursor.execute(sql, params)
+        products = fetch_dicts(cursor)
+        return json_response({
+            "products": products,
+            "query": q,
+            "limit": limit,
+            "offset": offset
+        })
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/search")
-async def search_products(q: str = Query(..., min_length=2)):
-    """Search products by name"""
+@router.get("/unit-prices", response_model=UnitPriceResults)
+def get_products_by_unit_price(
+    unit: Literal["kg", "l", "unit"] = "kg",
+    market: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    conn=Depends(get_db)
+):
+    """Products sold by ``unit``, cheapest price per kg/l/unit first"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT * FROM products 
-                WHERE name ILIKE %s 
-                ORDER BY name 
-                LIMIT 20
-            """, (f"%{q}%",))
-            products = cursor.fetchall()
-            return {"products": [dict(product) for product in products]}
+        cursor = conn.cursor()
+        query = """
+            SELECT * FROM products
+            WHERE quantity_unit = %s AND price_per_unit IS NOT NULL
+        """
+        params = [unit]
+        if market:
+            query += " AND market = %s"
+            params.append(market)
+        # Served in order by products_unit_price_idx (quantity_unit, price_per_unit, id)
+        query += " ORDER BY price_per_unit, id LIMIT %s OFFSET %s"
+        cursor.execute(query, params + [limit, offset])
+        products = fetch_dicts(cursor)
+        return json_response({
+            "products": products,
+            "unit": unit,
+            "limit": limit,
+            "offset": offset
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@router.get("/{product_id}", response_model=ProductDetail)
+def get_product(product_id: int, conn=Depends(get_db)):
+    """Get a specific product by ID"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+        product = fetch_dict(cursor)
+            
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+            
+        return json_response({"product": product})
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,46 @@
+from dataclasses import asdict
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+import psycopg2
+from database import get_db
+from responses import json_response
+from recipe_engine import CatalogIndex, optimize, parse_recipe
+
+router = APIRouter(prefix="/recipes", tags=["recipes"])
+# Shared in-memory catalog; main.py warms it at startup and each request
+# only checks the data version before using it.
+catalog = CatalogIndex()
+
+
+class RecipeRequest(BaseModel):
+    text: str = Field(..., min_length=1, description="One ingredient per line, e.g. '200 g de farine'")
+
+
+def _ingredient_dict(ingredient):
+    data = asdict(ingredient)
+    data["tokens"] = sorted(ingredient.tokens)
+    return data
+
+
+@router.post("/parse")
+def parse(recipe: RecipeRequest):
+    """Parse a recipe into ingredients with canonical quantities"""
+    return json_response({"ingredients": [_ingredient_dict(ingredient) for ingredient in parse_recipe(recipe.text)]})
+
+
+@router.post("/optimize")
+def optimize_recipe(recipe: RecipeRequest, conn=Depends(get_db)):
+    """Cheapest basket for a recipe, across stores and per store"""
+    ingredients = parse_recipe(recipe.text)
+    if not ingredients:
+        raise HTTPException(status_code=422, detail="No ingredients found in recipe")
+    try:
+        catalog.refresh(conn)
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return json_response({
+        "ingredients": [_ingredient_dict(ingredient) for ingredient in ingredients],
+        **optimize(catalog, ingredients)
+    })
@@ -0,0 +1,54 @@
+"""Ranked product search.
+
+Matching runs against ``f_unaccent(lower(name))`` so it is served by the
+``products_name_search_idx`` trigram index created by ``scripts/schema.py``
+and is accent- and case-insensitive ("creme" finds "Crème"). Results are
+ordered by trigram word similarity rather than alphabetically.
+"""
+from typing import Optional
+
+SEARCH_COLUMN = "f_unaccent(lower(name))"
+NORMALIZED_QUERY = "f_unaccent(lower(%(q)s))"
+
+
+def like_pattern(term: str) -> str:
+    """Wrap ``term`` for a substring LIKE match, escaping wildcards"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search_query(
+    q: str,
+    brand: Optional[str] = None,
+    market: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+):
+    """Return ``(sql, params)`` for a ranked search over products"""
+    params = {
+        "q": q,
+        "pattern": like_pattern(q),
+        "limit": limit,
+        "offset": offset,
+    }
+    # Substring hits plus fuzzy word matches (typos, partial words); both
+    # operators are supported by the gin_trgm_ops index.
+    conditions = [
+        f"({SEARCH_COLUMN} LIKE f_unaccent(lower(%(pattern)s))"
+        f" OR {NORMALIZED_QUERY} <%% {SEARCH_COLUMN})"
+    ]
+    if brand:
+        conditions.append("brand ILIKE %(brand)s")
+        params["brand"] = like_pattern(brand)
+    if market:
+        conditions.append("market = %(market)s")
+        params["market"] = market
+
+    sql = f"""
+        SELECT *, word_similarity({NORMALIZED_QUERY}, {SEARCH_COLUMN}) AS score
+        FROM products
+        WHERE {" AND ".join(conditions)}
+        ORDER BY score DESC, name, id
+        LIMIT %(limit)s OFFSET %(offset)s
+    """
+    return sql, params
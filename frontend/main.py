@@ -18,27 +18,33 @@ st.markdown("Browse and filter scraped product data")
 # Sidebar filters
 st.sidebar.header("Filters")
 
-def get_brands() -> List[str]:
-    """Fetch available brands from API"""
+@st.cache_data(ttl=60)
+def get_brand_data() -> List[Dict]:
+    """Fetch brand rows from API once per minute rather than on every rerun"""
     try:
         response = requests.get(f"{API_BASE_URL}/brands/names")
         if response.status_code == 200:
-            brands_data = response.json()["brands"]
-            return [brand["brand"] for brand in brands_data]
+            return response.json()["brands"]
         return []
     except:
         return []
 
-def get_products(brand=None, limit=50, offset=0, search_term=None) -> Dict:
+def get_brands() -> List[str]:
+    """Available brand names"""
+    return [brand["brand"] for brand in get_brand_data()]
+
+def get_products(brand=None, limit=50, cursor=None, search_term=None) -> Dict:
     """Fetch products from API"""
     try:
         if search_term:
             response = requests.get(f"{API_BASE_URL}/products/search", params={"q": search_term})
         else:
-            params = {"limit": limit, "offset": offset}
+            params = {"limit": limit}
+            if cursor:
+                params["cursor"] = cursor
             if brand and brand != "All Brands":
                 params["brand"] = brand
-            response = requests.get(f"{API_BASE_URL}/products/names", params=params)
+            response = requests.get(f"{API_BASE_URL}/products/products", params=params)
         
         if response.status_code == 200:
             return response.json()
@@ -65,27 +71,38 @@ else:
 col1, col2, col3 = st.columns([1, 2, 1])
 with col1:
     items_per_page = st.selectbox("Items per page", [10, 25, 50, 100], index=2)
-with col3:
-    if 'page_number' not in st.session_state:
-        st.session_state.page_number = 0
-    
-    if st.button("Previous Page") and st.session_state.page_number > 0:
-        st.session_state.page_number -= 1
-    
-    if st.button("Next Page"):
-        st.session_state.page_number += 1
+
+# Pages are fetched by keyset cursor: page_cursors[n] is the token that
+# starts page n, so going back or forward never re-scans earlier pages.
+page_key = (selected_brand, items_per_page)
+if st.session_state.get('page_key') != page_key:
+    st.session_state.page_key = page_key
+    st.session_state.page_number = 0
+    st.session_state.page_cursors = [None]
 
 # Fetch and display products
 if search_term:
     data = get_products(search_term=search_term)
     st.subheader(f"Search Results for: '{search_term}'")
 else:
-    offset = st.session_state.page_number * items_per_page
     data = get_products(
         brand=selected_brand if selected_brand != "All Brands" else None,
         limit=items_per_page,
-        offset=offset
+        cursor=st.session_state.page_cursors[st.session_state.page_number]
     )
+    next_cursor = data.get("next_cursor")
+
+    with col3:
+        if st.button("Previous Page") and st.session_state.page_number > 0:
+            st.session_state.page_number -= 1
+            st.rerun()
+
+        if st.button("Next Page", disabled=not next_cursor):
+            cursors = st.session_state.page_cursors[:st.session_state.page_number + 1]
+            cursors.append(next_cursor)
+            st.session_state.page_cursors = cursors
+            st.session_state.page_number += 1
+            st.rerun()
 
 products = data.get("products", [])
 total_products = data.get("total", 0)
@@ -166,21 +183,20 @@ st.sidebar.markdown("---")
 st.sidebar.header("📊 Quick Stats")
 
 try:
-    # Get brand statistics
-    brands_response = requests.get(f"{API_BASE_URL}/brands/names")
-    if brands_response.status_code == 200:
-        brands_data = brands_response.json()["brands"]
-        st.sidebar.metric("Total Brands", len(brands_data))
+    # Get brand statistics (precomputed server-side in brand_market_stats)
+    top_response = requests.get(f"{API_BASE_URL}/brands/top", params={"limit": 5})
+    if top_response.status_code == 200:
+        top_data = top_response.json()
+        st.sidebar.metric("Total Brands", top_data["total_brands"])
         
         # Show top brands
-        if brands_data:
+        if top_data["brands"]:
             st.sidebar.markdown("**Top Brands by Product Count:**")
-            sorted_brands = sorted(brands_data, key=lambda x: x['product_count'], reverse=True)[:5]
-            for brand in sorted_brands:
+            for brand in top_data["brands"]:
                 st.sidebar.write(f"• {brand['brand']}: {brand['product_count']}")
     
     # Get total products
-    total_response = requests.get(f"{API_BASE_URL}/products/names?limit=1")
+    total_response = requests.get(f"{API_BASE_URL}/products/products?limit=1")
     if total_response.status_code == 200:
         total = total_response.json().get("total", 0)
         st.sidebar.metric("Total Products", total)
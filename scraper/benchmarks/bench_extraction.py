@@ -0,0 +1,79 @@
+"""Micro-benchmark: extracting products from a Franprix listing page.
+
+"before" is the old spider code: parsel Selectors and six
+``contains(@class, ...)`` XPath queries per product node. "after" is
+``FranprixListing``: one lxml parse, precompiled XPath and a single walk
+per product node. The page is a synthetic fixture with the same markup
+as franprix.fr's promotions listing; pass a saved page to use it instead.
+
+Run from ``scraper/``:  python benchmarks/bench_extraction.py [page.html]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scrapy.http import HtmlResponse  # noqa: E402
+
+from scraper.extraction import FranprixListing  # noqa: E402
+
+PRODUCTS = 60
+PRODUCT_HTML = """
+<div class="product-item relative flex flex-col">
+  <a href="/courses/p/{i}"><img src="/img/{i}.jpg" alt=""></a>
+  <div class="product-item-content-resume flex flex-col gap-1">
+    <span class="product-item-name text-sm font-bold">Yaourt nature au lait entier {i}</span>
+    <div class="product-item-more text-xs text-grey"><span>Marque {i}</span><span>4 x 125 g</span></div>
+    <div class="product-item-price flex items-end"><span>{euros}</span><span>,{cents} €</span></div>
+    <span class="product-item-priceperkilo text-xs">{unit} € / kg</span>
+    <div class="product-item__promo__regular"><span>-30% sur le 2ème</span></div>
+  </div>
+</div>
+"""
+
+
+def fixture():
+    products = "".join(
+        PRODUCT_HTML.format(i=i, euros=1 + i % 9, cents=f"{i * 7 % 100:02d}", unit=f"{3 + i % 5},{i % 10}0")
+        for i in range(PRODUCTS)
+    )
+    pager = "".join(f'<a class="flex items-center" href="/courses/promotions?page={n}">{n}</a>' for n in range(1, 8))
+    return f"<html><head><meta charset='utf-8'></head><body><main>{products}</main><nav>{pager}</nav></body></html>"
+
+
+def before(body):
+    response = HtmlResponse("https://www.franprix.fr/courses/promotions?page=1", body=body, encoding="utf-8")
+    rows = []
+    for product in response.xpath("//div[contains(@class, 'product-item-content-resume')]"):
+        rows.append({
+            "name": product.xpath(".//span[contains(@class, 'product-item-name')]/text()").get(),
+            "more": product.xpath(".//div[contains(@class, 'product-item-more')]/span/text()").getall(),
+            "price": "".join(product.xpath(".//div[contains(@class, 'product-item-price')]/span/text()").getall()),
+            "unit_price": product.xpath(".//span[contains(@class, 'product-item-priceperkilo')]/text()").get(),
+            "promo": product.xpath(".//div[contains(@class, 'product-item__promo__regular')]/span/text()").get(),
+        })
+    response.xpath("//a[@href and contains(@href, 'page=2')]/@href").get()
+    return rows
+
+
+def after(body):
+    response = HtmlResponse("https://www.franprix.fr/courses/promotions?page=1", body=body, encoding="utf-8")
+    tree = FranprixListing.parse(response)
+    rows = list(FranprixListing.extract(tree))
+    FranprixListing.next_page_href(tree, 2)
+    return rows
+
+
+def main():
+    body = Path(sys.argv[1]).read_bytes() if len(sys.argv) > 1 else fixture().encode("utf-8")
+    assert before(body) == after(body), "extractors disagree"
+    products = len(after(body))
+    number = 200
+    for label, extract in (("before", before), ("after", after)):
+        seconds = min(timeit.repeat(lambda: extract(body), number=number, repeat=5)) / number
+        print(f"{label:>6}: {seconds * 1000:.2f} ms/page ({products} products, {len(body) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
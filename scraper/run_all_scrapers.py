@@ -0,0 +1,205 @@
+"""Run every market spider concurrently, then load the results.
+
+All spiders share one CrawlerProcess (one Twisted reactor), so a full crawl
+takes as long as the slowest market rather than the sum of all of them.
+Each spider writes a JSON Lines feed to ``data/<market>_<date>.jl`` which
+is handed to ``scripts/load_data.py`` once every crawl has finished.
+With ``--direct`` the feeds are skipped and items are written to PostgreSQL
+in batches while the crawl runs (``scraper.pipelines.PostgresPipeline``).
+With ``--incremental`` only products that changed since the last finished
+crawl are emitted (``scraper.incremental_crawl``). ``--render`` renders the
+pages that need JavaScript in headless Chromium (``scraper.rendering``).
+
+Every spider runs with its own JOBDIR under ``.scrapy/jobs/``: pending
+requests are queued on disk, seen requests and pagination cursors are
+persisted. ``--resume`` picks up the last unfinished crawl with its markets
+and run date, appending to the same feeds. After a clean stop (Ctrl-C
+once) it skips everything already fetched. After a crash or kill Scrapy's
+queue may be incomplete, but the Franprix and Monoprix spiders checkpoint
+their cursors after every page (``scraper.jobs``) and continue from the
+last page parsed. Without ``--resume`` every run starts afresh.
+
+    python scraper/run_all_scrapers.py
+    python scraper/run_all_scrapers.py --markets franprix monoprix --no-load
+    python scraper/run_all_scrapers.py --direct
+    python scraper/run_all_scrapers.py --incremental
+    python scraper/run_all_scrapers.py --resume
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from datetime import date
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+REPO_DIR = PROJECT_DIR.parent
+DATA_DIR = REPO_DIR / "data"
+LOADER = REPO_DIR / "scripts" / "load_data.py"
+# One JOBDIR per spider, plus the parameters of the run they belong to
+JOBS_DIR = PROJECT_DIR / ".scrapy" / "jobs"
+RUN_FILE = JOBS_DIR / "run.json"
+# Per-run crawl summaries; kept out of DATA_DIR, where the loader takes every .json for a feed
+STATS_DIR = PROJECT_DIR / ".scrapy" / "stats"
+
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "scraper.settings")
+
+from scrapy.crawler import CrawlerProcess  # noqa: E402
+from scrapy.utils.project import get_project_settings  # noqa: E402
+
+from scraper.rendering import PLAYWRIGHT_DOWNLOAD_HANDLERS  # noqa: E402
+
+# Market -> spider name; one spider per market so their outputs don't overlap
+MARKET_SPIDERS = {
+    "franprix": "franprix_improved",
+    "carrefour": "carrefour",
+    "monoprix": "monoprix_api_simple",
+}
+
+# Spider attributes (set from the crawl kwargs below) fill in the feed URI
+FEED_URI = str(DATA_DIR / "%(market)s_%(run_date)s.jl")
+
+
+def feed_path(market, run_date):
+    return DATA_DIR / f"{market}_{run_date}.jl"
+
+
+def prepare_database():
+    """Create or migrate the schema the direct pipeline writes through"""
+    sys.path.insert(0, str(REPO_DIR / "scripts"))
+    from load_data import get_connection, wait_for_postgres
+    from schema import create_schema
+
+    if not wait_for_postgres():
+        raise SystemExit("Failed to connect to PostgreSQL")
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            create_schema(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def start_run(markets, resume):
+    """(run date, markets, resumed) of this crawl
+
+    With ``resume`` and an interrupted run on record, that run's date and,
+    unless ``markets`` are given, its markets; otherwise a new run of today.
+    """
+    if resume and RUN_FILE.exists():
+        run = json.loads(RUN_FILE.read_text())
+        print(f"Resuming the crawl of {run['run_date']}")
+        return run["run_date"], markets or run["markets"], True
+    if resume:
+        print("No interrupted crawl to resume, starting a new one")
+    markets = markets or sorted(MARKET_SPIDERS)
+    shutil.rmtree(JOBS_DIR, ignore_errors=True)
+    JOBS_DIR.mkdir(parents=True)
+    run_date = date.today().isoformat()
+    RUN_FILE.write_text(json.dumps({"run_date": run_date, "markets": markets}))
+    return run_date, markets, False
+
+
+def crawl(markets, run_date, direct=False, incremental=False, render=False, resume=False):
+    """Crawl ``markets`` concurrently; return each market's Scrapy stats"""
+    settings = get_project_settings()
+    if render:
+        settings.set("RENDERING_ENABLED", True)
+        settings.set("DOWNLOAD_HANDLERS", PLAYWRIGHT_DOWNLOAD_HANDLERS)
+    if incremental:
+        settings.set("INCREMENTAL_ENABLED", True)
+        settings.set("HTTPCACHE_ENABLED", True)
+    if direct:
+        settings.set("POSTGRES_PIPELINE_ENABLED", True)
+    else:
+        # A resumed crawl adds to the feeds its first part wrote
+        settings.set("FEEDS", {FEED_URI: {"format": "jsonlines", "encoding": "utf8", "overwrite": not resume}})
+
+    process = CrawlerProcess(settings)
+    crawlers = {}
+    for market in markets:
+        spider_name = MARKET_SPIDERS[market]
+        crawler = process.create_crawler(spider_name)
+        crawler.settings.set("JOBDIR", str(JOBS_DIR / spider_name), priority="cmdline")
+        process.crawl(crawler, market=market, run_date=run_date)
+        crawlers[market] = crawler
+    process.start()
+    return {market: crawler.stats.get_stats() for market, crawler in crawlers.items()}
+
+
+def summarize(stats):
+    """The handful of counters worth keeping per market"""
+    summary = {}
+    for market, values in stats.items():
+        start, finish = values.get("start_time"), values.get("finish_time")
+        summary[market] = {
+            "items": values.get("item_scraped_count", 0),
+            "responses": values.get("response_received_count", 0),
+            "bytes": values.get("downloader/response_bytes", 0),
+            "unchanged": values.get("incremental/items_unchanged", 0),
+            "errors": values.get("log_count/ERROR", 0),
+            "stored": values.get("postgres/inserted", 0) + values.get("postgres/updated", 0),
+            "finish_reason": values.get("finish_reason"),
+            "seconds": (finish - start).total_seconds() if start and finish else None,
+        }
+    return summary
+
+
+def load(paths, workers):
+    command = [sys.executable, str(LOADER), *map(str, paths)]
+    if workers:
+        command += ["--workers", str(workers)]
+    return subprocess.run(command, cwd=REPO_DIR).returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl every supermarket and load the results")
+    parser.add_argument("--markets", nargs="+", choices=sorted(MARKET_SPIDERS), help="Default: all, or the resumed run's")
+    parser.add_argument("--no-load", action="store_true", help="Only crawl, don't run the loader")
+    parser.add_argument("--workers", type=int, help="Loader worker processes")
+    parser.add_argument("--incremental", action="store_true", help="Only emit products that changed since the last crawl")
+    parser.add_argument("--render", action="store_true", help="Render JavaScript-only pages in headless Chromium")
+    parser.add_argument("--resume", action="store_true", help="Continue the last interrupted crawl instead of starting over")
+    parser.add_argument("--direct", action="store_true", help="Write items to PostgreSQL during the crawl instead of via feeds")
+    args = parser.parse_args()
+
+    run_date, markets, resumed = start_run(args.markets, args.resume)
+    DATA_DIR.mkdir(exist_ok=True)
+
+    if args.direct:
+        prepare_database()
+    summary = summarize(crawl(
+        markets, run_date,
+        direct=args.direct, incremental=args.incremental, render=args.render, resume=resumed,
+    ))
+    STATS_DIR.mkdir(parents=True, exist_ok=True)
+    stats_path = STATS_DIR / f"crawl_{run_date}.json"
+    stats_path.write_text(json.dumps(summary, indent=2))
+    for market, values in summary.items():
+        print(
+            f"{market}: {values['items']} items, {values['responses']} responses, "
+            f"{values['errors']} errors in {values['seconds'] or 0:.0f}s ({values['finish_reason']})"
+        )
+
+    if all(values["finish_reason"] == "finished" for values in summary.values()):
+        # Nothing left to resume
+        RUN_FILE.unlink(missing_ok=True)
+
+    if args.direct:
+        print(f"Stored {sum(values['stored'] for values in summary.values())} new or changed products")
+        return 0
+    if args.no_load:
+        return 0
+    feeds = [path for path in (feed_path(market, run_date) for market in markets) if path.exists() and path.stat().st_size]
+    if not feeds:
+        print("No items scraped, nothing to load")
+        return 1
+    return load(feeds, args.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Single-pass field extraction for HTML listing pages.
+
+A listing is a page of repeated product nodes. Subclasses of ``Listing``
+declare the XPath of those nodes and, per field, the tag and class
+fragment that marks it. Everything is compiled once, when the class is
+defined; at crawl time each page is parsed once by lxml and every product
+node is walked once, collecting all of its fields in that single pass,
+instead of running one XPath query (and building parsel Selectors) per
+field per product.
+
+See benchmarks/bench_extraction.py for the numbers.
+"""
+import re
+
+from lxml import etree, html
+
+# Page number in listing URLs, e.g. /courses/promotions?page=3
+PAGE_RE = re.compile(r"page=(\d+)")
+
+
+def page_number(url):
+    match = PAGE_RE.search(url)
+    return int(match.group(1)) if match else 1
+
+
+def own_text(element):
+    """The element's direct text nodes, as XPath's ``text()`` returns them"""
+    texts = [element.text] if element.text is not None else []
+    texts.extend(child.tail for child in element if child.tail is not None)
+    return texts
+
+
+class Field:
+    """Texts of ``tag`` elements whose class contains ``class_fragment``
+
+    With ``child`` the texts come from those children instead, like
+    ``//div[contains(@class, 'x')]/span/text()``. ``many`` keeps every text
+    rather than the first one; ``join`` concatenates them.
+    """
+
+    def __init__(self, tag, class_fragment, child=None, many=False, join=False):
+        self.tag = tag
+        self.class_fragment = class_fragment
+        self.child = child
+        self.many = many or join
+        self.join = join
+
+    def texts(self, element):
+        if self.child is None:
+            return own_text(element)
+        return [text for child in element if child.tag == self.child for text in own_text(child)]
+
+    def value(self, texts):
+        if self.join:
+            return "".join(texts)
+        if self.many:
+            return texts
+        return texts[0] if texts else None
+
+
+class Listing:
+    node_xpath = None
+    fields = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._nodes = etree.XPath(cls.node_xpath)
+        # tag -> [(field name, Field)], so each element is only tested
+        # against the fields that could match it
+        cls._by_tag = {}
+        for name, field in cls.fields.items():
+            cls._by_tag.setdefault(field.tag, []).append((name, field))
+        cls._parsers = {}
+
+    @classmethod
+    def parse(cls, response):
+        """The page's lxml tree, parsed straight from the response bytes"""
+        encoding = response.encoding
+        if encoding not in cls._parsers:
+            cls._parsers[encoding] = html.HTMLParser(encoding=encoding)
+        return html.document_fromstring(response.body, parser=cls._parsers[encoding], base_url=response.url)
+
+    @classmethod
+    def extract(cls, tree):
+        """One dict of field values per product node"""
+        by_tag = cls._by_tag
+        for node in cls._nodes(tree):
+            found = {}
+            for element in node.iter(*by_tag):
+                class_attr = element.get("class")
+                if not class_attr:
+                    continue
+                for name, field in by_tag[element.tag]:
+                    if field.class_fragment in class_attr:
+                        found.setdefault(name, []).extend(field.texts(element))
+            yield {name: field.value(found.get(name, [])) for name, field in cls.fields.items()}
+
+
+class FranprixListing(Listing):
+    node_xpath = "//div[contains(@class, 'product-item-content-resume')]"
+    fields = {
+        "name": Field("span", "product-item-name"),
+        # Brand, then size
+        "more": Field("div", "product-item-more", child="span", many=True),
+        "price": Field("div", "product-item-price", child="span", join=True),
+        "unit_price": Field("span", "product-item-priceperkilo"),
+        "promo": Field("div", "product-item__promo__regular", child="span"),
+    }
+    _next_page = etree.XPath("//a[@href and contains(@href, $needle)]/@href")
+
+    @classmethod
+    def next_page_href(cls, tree, page):
+        """Link to listing page ``page``, if the pager shows one"""
+        hrefs = cls._next_page(tree, needle=f"page={page}")
+        return str(hrefs[0]) if hrefs else None
@@ -0,0 +1,181 @@
+"""Incremental crawling: only emit products that changed since the last run.
+
+The HTTP cache (RFC2616Policy, see settings.py) revalidates pages with
+If-None-Match / If-Modified-Since, so unchanged pages cost a 304 instead of
+a full download. RFC2616Policy would serve a page it considers fresh
+(max-age, or heuristically from Last-Modified) without asking the server
+at all, so every request the spider makes is sent with
+``Cache-Control: max-age=0``. On top of that, ``IncrementalSpiderMiddleware``
+keeps a per-spider fingerprint store on disk:
+
+* listing pages whose body hashes the same as last run have their items
+  dropped (follow-up requests, e.g. pagination, still go through);
+* every other item is compared with the hash of its payload from last run
+  and only new or changed products are passed on.
+
+Fingerprints are only written back when a crawl finishes cleanly and
+every emitted item was stored, so neither an interrupted run nor a failed
+database write hides products from the next one. Enable with
+``INCREMENTAL_ENABLED``, together with ``HTTPCACHE_ENABLED``
+(``run_all_scrapers.py --incremental`` sets both).
+"""
+import hashlib
+import json
+import os
+
+from itemadapter import ItemAdapter, is_item
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+# Identity of a product within a market (as in the database's natural key)
+# and the fields whose change makes it worth emitting again
+KEY_FIELDS = ('market', 'name', 'brand', 'size')
+PAYLOAD_FIELDS = ('price', 'unit_price', 'unit_label', 'promo')
+# Stats counting items a pipeline accepted but then failed to write
+WRITE_ERROR_STATS = ('postgres/failed',)
+
+
+def revalidate(request):
+    """Make the HTTP cache check ``request`` with the server even if its copy looks fresh
+
+    >>> from scrapy.extensions.httpcache import RFC2616Policy
+    >>> from scrapy.http import Response
+    >>> from scrapy.settings import Settings
+    >>> from email.utils import formatdate
+    >>> policy = RFC2616Policy(Settings())
+    >>> cached = Response("https://example.com/promotions", headers={
+    ...     "Date": formatdate(usegmt=True), "Cache-Control": "max-age=3600",
+    ...     "Last-Modified": "Mon, 05 Oct 2026 08:00:00 GMT", "ETag": '"v1"',
+    ... })
+    >>> policy.is_cached_response_fresh(cached, Request(cached.url))
+    True
+    >>> request = revalidate(Request(cached.url))
+    >>> policy.is_cached_response_fresh(cached, request)
+    False
+    >>> request.headers["If-None-Match"], request.headers["If-Modified-Since"]
+    (b'"v1"', b'Mon, 05 Oct 2026 08:00:00 GMT')
+    """
+    request.headers.setdefault(b'Cache-Control', b'max-age=0')
+    return request
+
+
+def digest(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+class FingerprintStore:
+    """Page and item hashes from the last completed crawl, as one JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.items = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.pages = state.get('pages', {})
+            self.items = state.get('items', {})
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pages': self.pages, 'items': self.items}, f)
+        os.replace(tmp_path, self.path)
+
+    def page_changed(self, url, body):
+        fingerprint = hashlib.blake2b(body, digest_size=16).hexdigest()
+        changed = self.pages.get(url) != fingerprint
+        self.pages[url] = fingerprint
+        return changed
+
+    def item_changed(self, adapter):
+        key = digest(*(" ".join(str(adapter.get(field) or '').lower().split()) for field in KEY_FIELDS))
+        fingerprint = digest(*(adapter.get(field) for field in PAYLOAD_FIELDS))
+        changed = self.items.get(key) != fingerprint
+        self.items[key] = fingerprint
+        return changed
+
+
+class IncrementalSpiderMiddleware:
+    def __init__(self, directory, stats):
+        self.directory = directory
+        self.stats = stats
+        self.store = None
+        self.failed = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('INCREMENTAL_ENABLED'):
+            raise NotConfigured
+        middleware = cls(data_path(settings.get('INCREMENTAL_DIR', 'incremental'), createdir=True), crawler.stats)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(middleware.item_error, signal=signals.item_error)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.store = FingerprintStore(os.path.join(self.directory, f"{spider.name}.json")).load()
+        spider.logger.info(
+            f"Incremental crawl: {len(self.store.pages)} pages and "
+            f"{len(self.store.items)} products known from the last run"
+        )
+
+    def spider_closed(self, spider, reason):
+        if reason != 'finished':
+            return
+        # Pipelines have been closed by now, so their write errors are counted
+        failed = self.failed + sum(self.stats.get_value(stat, 0) for stat in WRITE_ERROR_STATS)
+        if failed:
+            spider.logger.warning(
+                f"Incremental crawl: {failed} items were not stored, keeping the last run's fingerprints"
+            )
+            return
+        self.store.save()
+
+    def item_error(self, item, response, spider, failure):
+        self.failed += 1
+
+    async def process_start(self, start):
+        async for output in start:
+            yield revalidate(output) if isinstance(output, Request) else output
+
+    def process_start_requests(self, start_requests, spider):
+        # Scrapy < 2.13
+        for output in start_requests:
+            yield revalidate(output) if isinstance(output, Request) else output
+
+    def process_spider_output(self, response, result, spider):
+        page_changed = self._page_changed(response)
+        for output in result:
+            if self._keep(output, page_changed):
+                yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        page_changed = self._page_changed(response)
+        async for output in result:
+            if self._keep(output, page_changed):
+                yield output
+
+    def _page_changed(self, response):
+        changed = self.store.page_changed(response.url, response.body)
+        if not changed:
+            self.stats.inc_value('incremental/pages_unchanged')
+        return changed
+
+    def _keep(self, output, page_changed):
+        # Requests always go through, so pagination is still followed
+        if isinstance(output, Request):
+            revalidate(output)
+            return True
+        if not is_item(output):
+            return True
+        if page_changed and self.store.item_changed(ItemAdapter(output)):
+            self.stats.inc_value('incremental/items_changed')
+            return True
+        self.stats.inc_value('incremental/items_unchanged')
+        return False
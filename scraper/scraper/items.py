@@ -3,10 +3,132 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+import re
+import unicodedata
+
 import scrapy
+from itemloaders.processors import MapCompose, TakeFirst
+from scrapy.loader import ItemLoader
+
+# Same rules as the parse_price / parse_size / parse_unit_label SQL
+# functions in scripts/schema.py, applied once while crawling.
+PRICE_RE = re.compile(r"[0-9]{1,8}(?:[.][0-9]+)?")
+MULTIPACK_RE = re.compile(r"([0-9]+)\s*x\s*([0-9]+(?:[.][0-9]+)?)\s*(kg|g|mg|l|cl|ml)\b")
+SIZE_RE = re.compile(r"([0-9]+(?:[.][0-9]+)?)\s*(kg|g|mg|l|cl|ml)\b")
+COUNT_RE = re.compile(r"(?:\bx\s*([0-9]+)\b|\b([0-9]+)\s*(?:x\b|pieces?|pcs?|unites?|oeufs?|sachets?|capsules?|rouleaux?))")
+LABEL_RE = re.compile(r"([0-9]+(?:[.][0-9]+)?)?\s*(?<![a-z])(kilogramme|kilo|kg|g|mg|litre|l|cl|ml|piece|unite|u)\b")
+
+SCALE = {"kg": 1, "g": 0.001, "mg": 0.000001, "l": 1, "cl": 0.01, "ml": 0.001}
+CANONICAL_UNIT = {
+    "kilogramme": "kg", "kilo": "kg", "kg": "kg", "g": "kg", "mg": "kg",
+    "litre": "l", "l": "l", "cl": "l", "ml": "l",
+    "piece": "unit", "unite": "unit", "u": "unit",
+}
+# What a canonical unit is stored as; parse_unit_label() reads these back
+UNIT_LABELS = {"kg": "kg", "l": "l", "unit": "unité"}
+
+
+def clean_text(value):
+    """Collapse whitespace (including nbsp) and drop empty strings"""
+    if not isinstance(value, str):
+        return value
+    return " ".join(value.split()) or None
+
+
+def _fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c)).replace(",", ".")
+
+
+def parse_price(value):
+    """"1,99 €" -> 1.99; numbers pass through rounded to the cent"""
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    cleaned = re.sub(r"[^0-9,.]", "", value).replace(",", ".")
+    if PRICE_RE.fullmatch(cleaned):
+        return round(float(cleaned), 2)
+    return None
+
+
+def parse_size(size):
+    """"6 x 33cl" -> (1.98, "l"), "x4" -> (4, "unit"), otherwise (None, None)"""
+    normalized = _fold(size)
+    match = MULTIPACK_RE.search(normalized)
+    if match:
+        count, amount, unit = match.groups()
+        return round(int(count) * float(amount) * SCALE[unit], 6), CANONICAL_UNIT[unit]
+    match = SIZE_RE.search(normalized)
+    if match:
+        amount, unit = match.groups()
+        return round(float(amount) * SCALE[unit], 6), CANONICAL_UNIT[unit]
+    match = COUNT_RE.search(normalized)
+    if match:
+        return int(match.group(1) or match.group(2)), "unit"
+    return None, None
+
+
+def parse_unit_label(label):
+    """"€/100g" -> ("kg", 0.1): the canonical unit and how much of it the price covers
+
+    >>> parse_unit_label("€/100g")
+    ('kg', 0.1)
+    >>> parse_unit_label("prix au kilo")
+    ('kg', 1.0)
+    >>> parse_unit_label("/ unité")
+    ('unit', 1.0)
+    >>> parse_unit_label("€ / 75 cl")
+    ('l', 0.75)
+    >>> parse_unit_label("le lot")
+    (None, None)
+    """
+    match = LABEL_RE.search(_fold(label))
+    if not match:
+        return None, None
+    amount, unit = match.groups()
+    return CANONICAL_UNIT[unit], float(amount or 1) * SCALE.get(unit, 1)
+
+
+class ProductItem(scrapy.Item):
+    name = scrapy.Field()
+    brand = scrapy.Field()
+    # Euros, already numeric
+    price = scrapy.Field()
+    # Euros per unit_label, rescaled to a whole kg / l / unité
+    unit_price = scrapy.Field()
+    unit_label = scrapy.Field()
+    # As shown by the retailer; part of the product's natural key
+    size = scrapy.Field()
+    # size in kg, l or units
+    quantity = scrapy.Field()
+    quantity_unit = scrapy.Field()
+    promo = scrapy.Field()
+    market = scrapy.Field()
+
+
+class ProductLoader(ItemLoader):
+    """Builds ProductItems from raw text or JSON values
+
+    Prices become floats and "/100g" style unit prices are rescaled to a
+    whole canonical unit, so nothing downstream parses text again.
+    """
+
+    default_item_class = ProductItem
+    default_input_processor = MapCompose(clean_text)
+    default_output_processor = TakeFirst()
 
+    price_in = MapCompose(clean_text, parse_price)
+    unit_price_in = MapCompose(clean_text, parse_price)
 
-class ScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    def load_item(self):
+        item = super().load_item()
+        size = item.get("size")
+        if size:
+            item["quantity"], item["quantity_unit"] = parse_size(str(size))
+        label = item.get("unit_label")
+        if label:
+            unit, per_quantity = parse_unit_label(label)
+            if unit:
+                item["unit_label"] = UNIT_LABELS[unit]
+                if item.get("unit_price") is not None and per_quantity:
+                    item["unit_price"] = round(item["unit_price"] / per_quantity, 2)
+        return item
@@ -0,0 +1,79 @@
+"""Crash-safe spider.state for resumable crawls.
+
+Scrapy's SpiderState extension loads ``spider.state`` from the JOBDIR when
+a spider opens, but only writes it back when the spider closes, so a
+crawl that is killed loses every cursor kept there. Spiders paging
+through listings call ``checkpoint()`` once a page's cursor has moved;
+it writes the same file SpiderState reads, atomically, so a resumed
+crawl starts from the last page that was parsed.
+
+Scrapy's own request queue and seen-requests file are only complete
+after a clean stop; the cursors are what a crawl resumes from after a
+kill. Checkpoints should stay small, since they are rewritten whole
+after every page; sets that grow with the crawl belong in a
+``SeenSet``, which appends to its own file instead.
+"""
+import os
+import pickle
+
+from scrapy.utils.job import job_dir
+
+# Name and pickle protocol used by scrapy.extensions.spiderstate.SpiderState
+STATE_FILE = "spider.state"
+
+
+def checkpoint(spider):
+    """Persist ``spider.state`` to the crawl's JOBDIR, if it has one"""
+    path = job_file(spider, STATE_FILE)
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(spider.state, f, protocol=4)
+    os.replace(tmp_path, path)
+
+
+def job_file(spider, name):
+    """Path of ``name`` in the crawl's JOBDIR, or None without one"""
+    settings = getattr(spider, "settings", None)
+    directory = job_dir(settings) if settings is not None else None
+    return os.path.join(directory, name) if directory else None
+
+
+class SeenSet:
+    """A set of strings, persisted as an append-only file when ``path`` is given
+
+    Each new value costs one line, so the file never needs rewriting; call
+    ``flush()`` before a checkpoint so the values behind it are on disk.
+    """
+
+    def __init__(self, path=None):
+        self.values = set()
+        self.file = None
+        if path:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.values.update(line.rstrip("\n") for line in f)
+            self.file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, value):
+        return value in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        if value in self.values:
+            return
+        self.values.add(value)
+        if self.file:
+            self.file.write(f"{value}\n")
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
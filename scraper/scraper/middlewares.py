@@ -3,98 +3,279 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+"""Crawl telemetry, exported per spider when it closes.
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+``TelemetryDownloaderMiddleware`` sits next to the download handler, so it
+only sees what actually went over the network (cache hits never reach it):
+latency histograms, bytes, status codes, retries and download errors per
+domain. ``TelemetrySpiderMiddleware`` sits next to the spider and times
+each callback and counts the items it yields per page.
 
+Both write into one ``Telemetry`` per crawler, which is dumped at spider
+close to ``.scrapy/<TELEMETRY_DIR>/<spider>.json`` and, in the Prometheus
+text format (e.g. for node_exporter's textfile collector), to
+``<spider>.prom``.
+"""
+import json
+import os
+import time
+import weakref
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
 
-class ScraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            yield bound, total
+
+
+class DomainMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.bytes = 0
+        self.statuses = Counter()
+        self.retries = 0
+        self.errors = Counter()
+
+
+class CallbackMetrics:
+    def __init__(self):
+        self.pages = 0
+        self.items = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class Telemetry:
+    """Metrics of one crawler, shared by the downloader and spider middlewares"""
+
+    _instances = weakref.WeakKeyDictionary()
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.domains = defaultdict(DomainMetrics)
+        self.callbacks = defaultdict(CallbackMetrics)
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        if not crawler.settings.getbool("TELEMETRY_ENABLED"):
+            raise NotConfigured
+        if crawler not in cls._instances:
+            telemetry = cls(data_path(crawler.settings.get("TELEMETRY_DIR", "telemetry"), createdir=True))
+            crawler.signals.connect(telemetry.spider_closed, signal=signals.spider_closed)
+            cls._instances[crawler] = telemetry
+        return cls._instances[crawler]
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def spider_closed(self, spider, reason):
+        market = getattr(spider, "market", None) or spider.name
+        path = os.path.join(self.directory, spider.name)
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(market, reason), f, indent=2)
+        with open(f"{path}.prom", "w", encoding="utf-8") as f:
+            f.write(self.as_prometheus(market))
+        spider.logger.info(f"Telemetry written to {path}.json and {path}.prom")
 
-        # Should return None or raise an exception.
-        return None
+    def as_dict(self, market, reason=None):
+        return {
+            "market": market,
+            "finish_reason": reason,
+            "domains": {
+                domain: {
+                    "requests": metrics.latency.count,
+                    "latency_seconds": {
+                        "sum": round(metrics.latency.sum, 3),
+                        "mean": round(metrics.latency.sum / metrics.latency.count, 3) if metrics.latency.count else None,
+                        "buckets": {str(bound): count for bound, count in metrics.latency.cumulative()},
+                    },
+                    "bytes": metrics.bytes,
+                    "statuses": {str(status): count for status, count in sorted(metrics.statuses.items())},
+                    "retries": metrics.retries,
+                    "errors": dict(metrics.errors),
+                }
+                for domain, metrics in self.domains.items()
+            },
+            "callbacks": {
+                name: {
+                    "pages": metrics.pages,
+                    "items": metrics.items,
+                    "requests": metrics.requests,
+                    "items_per_page": round(metrics.items / metrics.pages, 1) if metrics.pages else None,
+                    "parse_seconds": round(metrics.seconds, 3),
+                    "max_parse_seconds": round(metrics.max_seconds, 3),
+                }
+                for name, metrics in self.callbacks.items()
+            },
+        }
 
-    def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+    def as_prometheus(self, market):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in {"market": market, **labels}.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+        metric("scraper_request_latency_seconds", "histogram", "Download latency per domain", [
+            sample
+            for domain, metrics in self.domains.items()
+            for sample in (
+                *(("_bucket", {"domain": domain, "le": "+Inf" if bound == float("inf") else str(bound)}, count)
+                  for bound, count in metrics.latency.cumulative()),
+                ("_sum", {"domain": domain}, round(metrics.latency.sum, 6)),
+                ("_count", {"domain": domain}, metrics.latency.count),
+            )
+        ])
+        metric("scraper_response_bytes_total", "counter", "Response body bytes received per domain", [
+            ("", {"domain": domain}, metrics.bytes) for domain, metrics in self.domains.items()
+        ])
+        metric("scraper_responses_total", "counter", "Responses per domain and status code", [
+            ("", {"domain": domain, "status": str(status)}, count)
+            for domain, metrics in self.domains.items()
+            for status, count in sorted(metrics.statuses.items())
+        ])
+        metric("scraper_retries_total", "counter", "Retried requests per domain", [
+            ("", {"domain": domain}, metrics.retries) for domain, metrics in self.domains.items()
+        ])
+        metric("scraper_download_errors_total", "counter", "Failed downloads per domain and exception", [
+            ("", {"domain": domain, "exception": exception}, count)
+            for domain, metrics in self.domains.items()
+            for exception, count in metrics.errors.items()
+        ])
+        metric("scraper_parse_seconds_total", "counter", "Time spent in each spider callback", [
+            ("", {"callback": name}, round(metrics.seconds, 6)) for name, metrics in self.callbacks.items()
+        ])
+        metric("scraper_pages_parsed_total", "counter", "Responses handled by each spider callback", [
+            ("", {"callback": name}, metrics.pages) for name, metrics in self.callbacks.items()
+        ])
+        metric("scraper_items_total", "counter", "Items yielded by each spider callback", [
+            ("", {"callback": name}, metrics.items) for name, metrics in self.callbacks.items()
+        ])
+        return "\n".join(lines) + "\n"
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+def domain_of(request):
+    return urlparse(request.url).hostname or ""
 
-    async def process_start(self, start):
-        # Called with an async iterator over the spider start() method or the
-        # maching method of an earlier spider middleware.
-        async for item_or_request in start:
-            yield item_or_request
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+def callback_name(response, spider):
+    callback = getattr(response.request, "callback", None) or spider.parse
+    return f"{type(spider).__name__}.{getattr(callback, '__name__', 'parse')}"
 
 
-class ScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+class TelemetryDownloaderMiddleware:
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        return cls(Telemetry.from_crawler(crawler))
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if request.meta.get("retry_times"):
+            self.telemetry.domains[domain_of(request)].retries += 1
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        metrics = self.telemetry.domains[domain_of(request)]
+        # Set by Scrapy's downloader: time from sending the request to the response headers
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            metrics.latency.observe(latency)
+        metrics.bytes += len(response.body)
+        metrics.statuses[response.status] += 1
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+        self.telemetry.domains[domain_of(request)].errors[type(exception).__name__] += 1
+        return None
+
+
+class TelemetrySpiderMiddleware:
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(Telemetry.from_crawler(crawler))
+
+    def process_spider_output(self, response, result, spider):
+        metrics = self._page(response, spider)
+        page_seconds = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                # Only time spent inside the callback counts, not downstream work
+                started = time.perf_counter()
+                try:
+                    output = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    page_seconds += time.perf_counter() - started
+                self._count(metrics, output)
+                yield output
+        finally:
+            self._parsed(metrics, page_seconds)
+
+    async def process_spider_output_async(self, response, result, spider):
+        metrics = self._page(response, spider)
+        page_seconds = 0.0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    output = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    page_seconds += time.perf_counter() - started
+                self._count(metrics, output)
+                yield output
+        finally:
+            self._parsed(metrics, page_seconds)
+
+    def _page(self, response, spider):
+        metrics = self.telemetry.callbacks[callback_name(response, spider)]
+        metrics.pages += 1
+        return metrics
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    def _parsed(self, metrics, seconds):
+        metrics.seconds += seconds
+        metrics.max_seconds = max(metrics.max_seconds, seconds)
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def _count(self, metrics, output):
+        if isinstance(output, Request):
+            metrics.requests += 1
+        else:
+            metrics.items += 1
@@ -3,11 +3,211 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem, NotConfigured
+from twisted.internet import defer, task, threads
+
+# The staging table and the load functions are defined once, in
+# scripts/schema.py, and created by scripts/load_data.py or
+# run_all_scrapers.py --direct
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+from schema import COPY_QUERY, LOAD_FUNCTIONS, STAGING_COLUMNS  # noqa: E402
+
+MERGE_RETRIES = 3
+
+
+class ValidationPipeline:
+    """Drop nameless and duplicate products before anything stores them
+
+    Duplicates are recognised within one crawl by market, name, brand and
+    size (case and whitespace folded), the same parts the database's
+    natural key is built from.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.seen = set()
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def open_spider(self, spider):
+        self.seen = set()
 
-class ScraperPipeline:
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if not adapter.get('name'):
+            self.stats.inc_value('validation/missing_name')
+            raise DropItem("Product without a name")
+        if not adapter.get('market'):
+            adapter['market'] = getattr(spider, 'market', None) or spider.name
+
+        key = tuple(
+            " ".join(str(adapter.get(field) or '').lower().split())
+            for field in ('market', 'name', 'brand', 'size')
+        )
+        if key in self.seen:
+            self.stats.inc_value('validation/duplicate')
+            raise DropItem(f"Duplicate product {adapter['name']!r}")
+        self.seen.add(key)
         return item
+
+
+class PostgresPipeline:
+    """Write items straight to PostgreSQL in batches instead of a JSON feed
+
+    Each batch is COPY'd into the same staging table scripts/load_data.py
+    uses and merged by the same SQL functions, so a direct crawl leaves the
+    database exactly as crawl-then-load would. Database work runs in the
+    reactor threadpool, one batch at a time per spider; the crawl is only
+    paused when more than POSTGRES_MAX_PENDING items are waiting to be
+    written.
+    """
+
+    def __init__(self, db_config, batch_size, flush_interval, max_pending, stats):
+        self.db_config = db_config
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.stats = stats
+        self.conn = None
+        self.market = None
+        self.buffer = []
+        self.pending = 0
+        self.changed = 0
+        self.lock = defer.DeferredLock()
+        self.flusher = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('POSTGRES_PIPELINE_ENABLED'):
+            raise NotConfigured
+        db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'scraped_data'),
+            'user': os.getenv('DB_USER', 'myuser'),
+            'password': os.getenv('DB_PASSWORD', 'mypassword'),
+        }
+        return cls(
+            db_config,
+            batch_size=settings.getint('POSTGRES_BATCH_SIZE', 1000),
+            flush_interval=settings.getfloat('POSTGRES_FLUSH_INTERVAL', 5.0),
+            max_pending=settings.getint('POSTGRES_MAX_PENDING', 5000),
+            stats=crawler.stats,
+        )
+
+    @defer.inlineCallbacks
+    def open_spider(self, spider):
+        # Rows without a market of their own are filed under the spider's
+        self.market = getattr(spider, 'market', None) or spider.name
+        self.conn = yield threads.deferToThread(self._connect)
+        # Slow crawls still reach the database every few seconds
+        self.flusher = task.LoopingCall(self.flush, spider)
+        self.flusher.start(self.flush_interval, now=False)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        self.buffer.append([adapter.get(column) for column in STAGING_COLUMNS])
+        self.pending += 1
+        if len(self.buffer) < self.batch_size:
+            return item
+        flushed = self.flush(spider)
+        if self.pending <= self.max_pending:
+            return item
+        # Backpressure: hold this item until the database has caught up
+        return flushed.addCallback(lambda _: item)
+
+    def flush(self, spider):
+        """Hand the buffered rows to a writer thread; fires once they are committed"""
+        if not self.buffer:
+            return defer.succeed(None)
+        rows, self.buffer = self.buffer, []
+        flushed = self.lock.run(threads.deferToThread, self._write, rows)
+        flushed.addCallbacks(self._written, self._failed, errbackArgs=(rows, spider))
+        flushed.addBoth(self._release, len(rows))
+        return flushed
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        if self.flusher and self.flusher.running:
+            self.flusher.stop()
+        yield self.flush(spider)
+        yield self.lock.run(threads.deferToThread, self._finish)
+        spider.logger.info(f"PostgreSQL: {self.changed} products inserted or updated")
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM unnest(%s::text[]) AS name WHERE to_regproc(name) IS NULL",
+                (list(LOAD_FUNCTIONS),)
+            )
+            missing = [row[0] for row in cursor.fetchall()]
+        conn.rollback()
+        if missing:
+            conn.close()
+            raise RuntimeError(f"Database schema is out of date (missing {', '.join(missing)}); run scripts/load_data.py first")
+        return conn
+
+    def _write(self, rows):
+        """COPY, merge and observe one batch in a single transaction (worker thread)"""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        for attempt in range(1, MERGE_RETRIES + 1):
+            buffer.seek(0)
+            try:
+                with self.conn.cursor() as cursor:
+                    cursor.execute("SELECT prepare_products_staging()")
+                    cursor.copy_expert(COPY_QUERY, buffer)
+                    cursor.execute("SELECT * FROM merge_products_staging(%s)", (self.market,))
+                    inserted_count, updated_count = cursor.fetchone()
+                    cursor.execute("SELECT observe_products_staging(%s)", (self.market,))
+                    observed_count = cursor.fetchone()[0]
+                self.conn.commit()
+            except psycopg2.errors.DeadlockDetected:
+                self.conn.rollback()
+                if attempt == MERGE_RETRIES:
+                    raise
+                continue
+            except psycopg2.Error:
+                self.conn.rollback()
+                raise
+            return inserted_count, updated_count, observed_count
+
+    def _finish(self):
+        try:
+            # Refresh brand statistics and bump the API's data version, as the loader does
+            if self.changed:
+                with self.conn.cursor() as cursor:
+                    cursor.execute("SELECT finish_products_load()")
+                self.conn.commit()
+        finally:
+            self.conn.close()
+
+    def _written(self, counts):
+        inserted_count, updated_count, observed_count = counts
+        self.changed += inserted_count + updated_count
+        self.stats.inc_value('postgres/batches')
+        self.stats.inc_value('postgres/inserted', inserted_count)
+        self.stats.inc_value('postgres/updated', updated_count)
+        self.stats.inc_value('postgres/observed', observed_count)
+
+    def _failed(self, failure, rows, spider):
+        # A bad batch is dropped, as load_data.py skips a failing COPY batch
+        self.stats.inc_value('postgres/failed', len(rows))
+        spider.logger.error(f"Dropped a batch of {len(rows)} items: {failure.getErrorMessage()}")
+
+    def _release(self, result, count):
+        self.pending -= count
+        return result
@@ -0,0 +1,131 @@
+"""Opt-in headless rendering through a bounded pool of Playwright contexts.
+
+Only requests that set ``meta={"render": True}`` are rendered; everything
+else keeps going through Scrapy's plain HTTP handler. Rendered requests are
+spread over ``RENDER_CONTEXTS`` long-lived browser contexts (one browser for
+the whole crawl), each running at most ``PLAYWRIGHT_MAX_PAGES_PER_CONTEXT``
+pages at a time. After ``RENDER_PAGES_PER_CONTEXT`` pages a context is
+retired and closed once its last page is done, which keeps memory bounded
+on long crawls. Images, media, fonts and analytics never leave the browser.
+
+Enable with ``RENDERING_ENABLED=1`` (or ``run_all_scrapers.py --render``);
+it needs ``scrapy-playwright`` and ``playwright install chromium``.
+"""
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from scrapy.exceptions import NotConfigured
+
+PLAYWRIGHT_DOWNLOAD_HANDLERS = {
+    "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+    "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
+}
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "contentsquare.net",
+    "bing.com",
+)
+
+
+def should_abort_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST hook: skip what the parser never looks at"""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlparse(request.url).hostname or ""
+    return any(host == blocked or host.endswith(f".{blocked}") for blocked in BLOCKED_HOSTS)
+
+
+async def remember_page(page, request):
+    """PLAYWRIGHT page init callback: keep the page where a failure can reach it"""
+    request.meta["render_page"] = page
+
+
+class RenderingMiddleware:
+    """Assign rendered requests to pooled contexts and rotate them"""
+
+    def __init__(self, contexts, pages_per_context, stats):
+        self.contexts = contexts
+        self.pages_per_context = pages_per_context
+        self.stats = stats
+        self.next_slot = 0
+        self.generation = [0] * contexts
+        self.uses = [0] * contexts
+        # Context name -> pages in flight, and contexts waiting to be closed
+        self.in_flight = defaultdict(int)
+        self.retired = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("RENDERING_ENABLED"):
+            raise NotConfigured
+        return cls(
+            settings.getint("RENDER_CONTEXTS", 2),
+            settings.getint("RENDER_PAGES_PER_CONTEXT", 100),
+            crawler.stats,
+        )
+
+    def process_request(self, request, spider):
+        # Retries come through here again and get a fresh assignment
+        if not request.meta.get("render"):
+            return None
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.contexts
+        context = f"render-{slot}-{self.generation[slot]}"
+        self.uses[slot] += 1
+        if self.uses[slot] >= self.pages_per_context:
+            self.retired.add(context)
+            self.generation[slot] += 1
+            self.uses[slot] = 0
+
+        self.in_flight[context] += 1
+        request.meta.pop("render_page", None)
+        request.meta.update(
+            playwright=True,
+            playwright_context=context,
+            # The page comes back so it can be closed here, not left to the callback
+            playwright_include_page=True,
+            # ... and is recorded as soon as it opens, for requests that fail
+            playwright_page_init_callback="scraper.rendering.remember_page",
+        )
+        self.stats.inc_value("rendering/requests")
+        return None
+
+    async def process_response(self, request, response, spider):
+        page = response.meta.pop("playwright_page", None) or request.meta.get("render_page")
+        await self._finish(request, page)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        # With playwright_include_page scrapy-playwright leaves the page of a
+        # failed request open too
+        await self._finish(request, request.meta.get("render_page"))
+        return None
+
+    async def _finish(self, request, page):
+        """Close a rendered request's page, and its context once retired and idle"""
+        request.meta.pop("render_page", None)
+        if not request.meta.get("render") or "playwright_context" not in request.meta:
+            return
+        if page is not None and not page.is_closed():
+            await page.close()
+        if self._release(request.meta["playwright_context"]) and page is not None:
+            await page.context.close()
+            self.stats.inc_value("rendering/contexts_closed")
+
+    def _release(self, context):
+        """True once a retired context has no pages left"""
+        self.in_flight[context] -= 1
+        if self.in_flight[context] > 0 or context not in self.retired:
+            return False
+        del self.in_flight[context]
+        self.retired.discard(context)
+        return True
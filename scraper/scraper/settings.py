@@ -7,6 +7,10 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
+from scraper.rendering import PLAYWRIGHT_DOWNLOAD_HANDLERS, should_abort_request
+
 BOT_NAME = "scraper"
 
 SPIDER_MODULES = ["scraper.spiders"]
@@ -22,14 +26,16 @@ ADDONS = {}
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# Markets are crawled side by side by run_all_scrapers.py, so the global
+# limit is sized for several domains at once.
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -46,48 +52,100 @@ ROBOTSTXT_OBEY = False
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "scraper.middlewares.ScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "scraper.incremental_crawl.IncrementalSpiderMiddleware": 543,
+    # Next to the spider, so it times the callbacks alone
+    "scraper.middlewares.TelemetrySpiderMiddleware": 990,
+}
+
+# Only emit products that changed since the last finished crawl (off unless
+# asked for, e.g. by run_all_scrapers.py --incremental). Fingerprints are
+# kept in .scrapy/<INCREMENTAL_DIR>/<spider>.json.
+INCREMENTAL_ENABLED = os.getenv("INCREMENTAL_ENABLED", "0") == "1"
+INCREMENTAL_DIR = "incremental"
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "scraper.middlewares.ScraperDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    # Next to the download handler, so it sees rendered responses first
+    "scraper.rendering.RenderingMiddleware": 950,
+    # After the HTTP cache (900), so only network traffic is measured
+    "scraper.middlewares.TelemetryDownloaderMiddleware": 960,
+}
+
+# Per-domain download and per-callback parse metrics, written at spider close
+# to .scrapy/<TELEMETRY_DIR>/<spider>.json and <spider>.prom
+TELEMETRY_ENABLED = True
+TELEMETRY_DIR = "telemetry"
+
+# Render requests flagged meta["render"] in headless Chromium (off unless
+# asked for, e.g. by run_all_scrapers.py --render). See scraper/rendering.py.
+RENDERING_ENABLED = os.getenv("RENDERING_ENABLED", "0") == "1"
+if RENDERING_ENABLED:
+    DOWNLOAD_HANDLERS = PLAYWRIGHT_DOWNLOAD_HANDLERS
+# Contexts in the pool, and pages each one renders before it is replaced
+RENDER_CONTEXTS = 2
+RENDER_PAGES_PER_CONTEXT = 100
+PLAYWRIGHT_BROWSER_TYPE = "chromium"
+PLAYWRIGHT_LAUNCH_OPTIONS = {"headless": True}
+# A retiring context may still be finishing pages while its successor starts
+PLAYWRIGHT_MAX_CONTEXTS = RENDER_CONTEXTS * 2
+PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = 4
+PLAYWRIGHT_ABORT_REQUEST = should_abort_request
+PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 30 * 1000
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "scraper.throttle.AdaptiveThrottle": 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "scraper.pipelines.ScraperPipeline": 300,
-#}
-
-# Enable and configure the AutoThrottle extension (disabled by default)
-# See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
-# The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
-# The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
-# The average number of requests Scrapy should be sending in parallel to
-# each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-# Enable showing throttling stats for every response received:
-#AUTOTHROTTLE_DEBUG = False
+ITEM_PIPELINES = {
+    "scraper.pipelines.ValidationPipeline": 300,
+    "scraper.pipelines.PostgresPipeline": 800,
+}
+
+# Write items straight to PostgreSQL (off unless asked for, e.g. by
+# run_all_scrapers.py --direct); batches are flushed when full or every
+# POSTGRES_FLUSH_INTERVAL seconds, and the crawl is paused while more than
+# POSTGRES_MAX_PENDING items are waiting on the database.
+POSTGRES_PIPELINE_ENABLED = os.getenv("POSTGRES_PIPELINE_ENABLED", "0")
+POSTGRES_BATCH_SIZE = int(os.getenv("POSTGRES_BATCH_SIZE", "1000"))
+POSTGRES_FLUSH_INTERVAL = 5.0
+POSTGRES_MAX_PENDING = 5000
+
+# AutoThrottle is replaced by scraper.throttle.AdaptiveThrottle (see EXTENSIONS)
+AUTOTHROTTLE_ENABLED = False
+
+# Adaptive per-domain concurrency and delay: grows towards
+# CONCURRENT_REQUESTS_PER_DOMAIN and down to DOWNLOAD_DELAY while the site
+# keeps up, backs off on 429/503, Cloudflare challenges and rising latency.
+# Per-domain profiles are kept between runs in .scrapy/<ADAPTIVE_THROTTLE_DIR>/.
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_START_CONCURRENCY = 2
+ADAPTIVE_THROTTLE_START_DELAY = 1
+ADAPTIVE_THROTTLE_MAX_DELAY = 60
+# Latency above this multiple of the best of the domain's last
+# ADAPTIVE_THROTTLE_LATENCY_WINDOW responses counts as congestion
+ADAPTIVE_THROTTLE_LATENCY_TOLERANCE = 3.0
+ADAPTIVE_THROTTLE_LATENCY_WINDOW = 50
+ADAPTIVE_THROTTLE_DIR = "throttle"
+ADAPTIVE_THROTTLE_DEBUG = False
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Incremental crawls only: RFC2616Policy revalidates stale pages with
+# If-None-Match/If-Modified-Since, so a page that hasn't changed since the
+# last crawl comes back as a 304.
+HTTPCACHE_ENABLED = INCREMENTAL_ENABLED
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = [403, 429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+HTTPCACHE_GZIP = True
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
@@ -1,8 +1,11 @@
 import scrapy
 
+from scraper.items import ProductLoader
+
 
 class CarrefourSpider(scrapy.Spider):
     name = "carrefour"
+    market = "carrefour"
     
     async def start(self):
         url = "https://www.carrefour.fr/promotions"
@@ -10,10 +13,12 @@ class CarrefourSpider(scrapy.Spider):
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
         "(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
         }
-        yield scrapy.Request(url=url, headers=headers, callback=self.parse)
+        # The promotions grid is rendered client-side
+        yield scrapy.Request(url=url, headers=headers, callback=self.parse, meta={"render": True})
 
     def parse(self, response):
         for product in response.xpath("//div[contains(@class, 'product-list-card-plp-grid__infos')]"):
-            yield {
-                    "name": product.xpath(".//a/h3/text()").get()
-                    }
+            loader = ProductLoader(selector=product)
+            loader.add_xpath("name", ".//a/h3/text()")
+            loader.add_value("market", self.market)
+            yield loader.load_item()
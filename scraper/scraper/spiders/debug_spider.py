@@ -9,12 +9,16 @@ class CarrefourDebugSpider(scrapy.Spider):
         'LOG_LEVEL': 'DEBUG'
     }
     
+    # scrapy crawl carrefour_debug -a render=1 (with RENDERING_ENABLED=1)
+    # compares the rendered page with the plain one
+    render = "0"
+    
     def start_requests(self):
         yield scrapy.Request(
             url="https://www.carrefour.fr/promotions",
             callback=self.parse,
             headers={'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'},
-            meta={'dont_cache': True}
+            meta={'dont_cache': True, 'render': self.render == "1"}
         )
     
     def parse(self, response):
@@ -1,13 +1,23 @@
 import scrapy
 
+from scraper.extraction import FranprixListing, page_number
+from scraper.items import ProductLoader
+from scraper.jobs import checkpoint
+
+
 class FranprixSpider(scrapy.Spider):
     name = "franprix_improved"
+    market = "franprix"
     
+    # Request rate is set per domain by scraper.throttle.AdaptiveThrottle
     custom_settings = {
         'ROBOTSTXT_OBEY': False,
-        'DOWNLOAD_DELAY': 1,
-        'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
     }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Replaced by the persisted state when the crawl runs with a JOBDIR
+        self.state = {}
     
     def start_requests(self):  # Fixed: should be start_requests, not async start
         url = "https://www.franprix.fr/courses/promotions"
@@ -15,41 +25,47 @@ class FranprixSpider(scrapy.Spider):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
         }
-        yield scrapy.Request(url=url, headers=headers, callback=self.parse)
+        # Pagination cursor, persisted in JOBDIR between runs of the same job
+        next_page_url = self.state.get("next_page")
+        if next_page_url:
+            self.logger.info(f"⏩ Resuming at {next_page_url}")
+            # Already seen by the dupefilter, but possibly lost in flight
+            yield scrapy.Request(url=next_page_url, headers=headers, callback=self.parse, dont_filter=True)
+        else:
+            yield scrapy.Request(url=url, headers=headers, callback=self.parse)
     
     def parse(self, response):
         # Extract current page number for logging
         current_page = self.get_current_page(response.url)
         self.logger.info(f"📄 Scraping page {current_page}: {response.url}")
         
-        # Extract products (your existing code)
+        # Parsed once; every product node is then walked a single time
+        tree = FranprixListing.parse(response)
         products_found = 0
-        for product in response.xpath("//div[contains(@class, 'product-item-content-resume')]"):
+        for fields in FranprixListing.extract(tree):
             try:
-                brand_unit = product.xpath(".//div[contains(@class, 'product-item-more')]/span/text()").getall()
-                price = "".join(product.xpath(".//div[contains(@class, 'product-item-price')]/span/text()").getall())
+                brand_unit = fields["more"]
                 
                 # Handle unit_price safely
-                unit_price_text = product.xpath(".//span[contains(@class, 'product-item-priceperkilo')]/text()").get()
+                unit_price_text = fields["unit_price"]
                 unit_price, unit_label = None, None
                 
                 if unit_price_text and "/" in unit_price_text:
                     unit_price, unit_label = unit_price_text.split("/", 1)
                 
-                product_data = {
-                    "name": product.xpath(".//span[contains(@class, 'product-item-name')]/text()").get(),
-                    "brand": brand_unit[0] if brand_unit else None,
-                    "price": price,
-                    "size": brand_unit[1] if len(brand_unit) > 1 else None,
-                    "unit_price": unit_price,
-                    "unit_label": unit_label,
-                    "promo": product.xpath(".//div[contains(@class, 'product-item__promo__regular')]/span/text()").get(),
-                    "page": current_page,
-                    "source_url": response.url
-                }
+                loader = ProductLoader()
+                loader.add_value("name", fields["name"])
+                loader.add_value("brand", brand_unit[:1])
+                loader.add_value("price", fields["price"])
+                loader.add_value("size", brand_unit[1:2])
+                loader.add_value("unit_price", unit_price)
+                loader.add_value("unit_label", unit_label)
+                loader.add_value("promo", fields["promo"])
+                loader.add_value("market", self.market)
+                product_data = loader.load_item()
                 
                 # Only yield if we have a name
-                if product_data["name"]:
+                if product_data.get("name"):
                     products_found += 1
                     yield product_data
                     
@@ -60,8 +76,10 @@ class FranprixSpider(scrapy.Spider):
         self.logger.info(f"✅ Found {products_found} products on page {current_page}")
         
         # Handle pagination - based on your HTML structure
-        next_page_url = self.find_next_page(response)
+        next_page_url = self.find_next_page(response, tree)
         
+        self.state["next_page"] = next_page_url
+        checkpoint(self)
         if next_page_url:
             self.logger.info(f"🔄 Following to next page: {next_page_url}")
             yield scrapy.Request(
@@ -70,21 +88,16 @@ class FranprixSpider(scrapy.Spider):
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                     "(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
                 },
-                callback=self.parse,
-                meta={'dont_cache': True}
+                callback=self.parse
             )
         else:
             self.logger.info(f"🏁 No more pages found after page {current_page}")
     
     def get_current_page(self, url):
         """Extract current page number from URL"""
-        import re
-        if 'page=' in url:
-            match = re.search(r'page=(\d+)', url)
-            return int(match.group(1)) if match else 1
-        return 1
+        return page_number(url)
     
-    def find_next_page(self, response):
+    def find_next_page(self, response, tree):
         """Find next page URL from pagination"""
         
         # Strategy 1: Look for active page and find the next numbered page
@@ -94,8 +107,7 @@ class FranprixSpider(scrapy.Spider):
         next_page = current_page + 1
         
         # Look for next page link directly
-        next_page_xpath = f"//a[@href and contains(@href, 'page={next_page}')]/@href"
-        next_page_url = response.xpath(next_page_xpath).get()
+        next_page_url = FranprixListing.next_page_href(tree, next_page)
         
         if next_page_url:
             return response.urljoin(next_page_url)
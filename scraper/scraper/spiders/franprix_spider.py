@@ -1,7 +1,13 @@
 import scrapy
 
+from scraper.extraction import FranprixListing
+from scraper.items import ProductLoader
+
+
 class FranprixSpider(scrapy.Spider):
     name = "franprix"
+    market = "franprix"
+
     async def start(self):
         url = "https://www.franprix.fr/courses/promotions"
         headers = {
@@ -11,17 +17,17 @@ class FranprixSpider(scrapy.Spider):
         yield scrapy.Request(url=url, headers=headers, callback=self.parse)
 
     def parse(self, response):
-        for product in response.xpath("//div[contains(@class, 'product-item-content-resume')]"):
-            brand_unit = product.xpath(".//div[contains(@class, 'product-item-more')]/span/text()").getall()
-            price = "".join(product.xpath(".//div[contains(@class, 'product-item-price')]/span/text()").getall())
-            unit_price, unit_lable = product.xpath(".//span[contains(@class, 'product-item-priceperkilo')]/text()").get().split("/")
+        for fields in FranprixListing.extract(FranprixListing.parse(response)):
+            brand_unit = fields["more"]
+            unit_price, _, unit_label = (fields["unit_price"] or "").partition("/")
 
-            yield {
-                    "name": product.xpath(".//span[contains(@class, 'product-item-name')]/text()").get(),
-                    "brand": brand_unit[0],
-                    "price": price,
-                    "size": brand_unit[1],
-                    "unit_price": unit_price,
-                    "unit_label": unit_label,
-                    "promo": product.xpath(".//div[contains(@class, 'product-item__promo__regular')]/span/text()").get()
-                    }
+            loader = ProductLoader()
+            loader.add_value("name", fields["name"])
+            loader.add_value("brand", brand_unit[:1])
+            loader.add_value("price", fields["price"])
+            loader.add_value("size", brand_unit[1:2])
+            loader.add_value("unit_price", unit_price)
+            loader.add_value("unit_label", unit_label)
+            loader.add_value("promo", fields["promo"])
+            loader.add_value("market", self.market)
+            yield loader.load_item()
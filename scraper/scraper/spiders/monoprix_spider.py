@@ -1,31 +1,131 @@
 import scrapy
 import json
 
+from w3lib.url import add_or_replace_parameter
+
+from scraper.items import ProductLoader
+from scraper.jobs import SeenSet, checkpoint, job_file
+
+# Stream key used when the category tree can't be fetched
+ALL_PRODUCTS = "all"
+
+
 class MonoprixAPISimpleSpider(scrapy.Spider):
+    """Monoprix product API, one paginated stream per category
+
+    Pages of a stream are chained by nextPageToken, so a single stream is
+    bound by round-trip latency. The spider lists the categories first and
+    pages through each of them in parallel; the per-host limits below keep
+    the total request rate polite. Each stream's next token is kept in
+    spider.state and checkpointed to the JOBDIR after every page, so a crawl
+    run with a JOBDIR picks up where every stream left off, even after it
+    was killed or with pages in flight when it stopped. Product ids already
+    yielded are appended to their own file there, outside the checkpoint.
+
+        scrapy crawl monoprix_api_simple -a categories_url=https://...
+        scrapy crawl monoprix_api_simple -s JOBDIR=.scrapy/jobs/monoprix_api_simple
+    """
     name = "monoprix_api_simple"
+    market = "monoprix"
     base_url = "https://courses.monoprix.fr/api/v6/products"
-    
+    categories_url = "https://courses.monoprix.fr/api/v6/categories"
+    # Query parameter restricting base_url to one category
+    category_param = "categoryId"
+
+    custom_settings = {
+        # Per-host limits shared by all category streams; AdaptiveThrottle
+        # tunes the rate within them
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+        'DOWNLOAD_DELAY': 0.25,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Replaced by the persisted state when the crawl runs with a JOBDIR
+        self.state = {}
+        # Products listed under several categories are only yielded once;
+        # reopened from the JOBDIR in start_requests
+        self.seen_ids = SeenSet()
+
+    # Lives in spider.state, loaded from the JOBDIR by Scrapy's SpiderState
+    # extension and saved by scraper.jobs.checkpoint()
+    @property
+    def tokens(self):
+        """Stream -> token of its next page ("" for the first), None once exhausted"""
+        return self.state.setdefault('tokens', {})
+
     def start_requests(self):
-        yield scrapy.Request(
-            url=self.base_url,
+        # Only a few bytes per product, appended as they are seen; the
+        # checkpointed state stays the size of the cursors
+        self.state.pop('seen_ids', None)
+        self.seen_ids = SeenSet(job_file(self, "seen_ids.txt"))
+        pending = {stream: token for stream, token in self.tokens.items() if token is not None}
+        if pending:
+            self.logger.info(f"Resuming {len(pending)} streams")
+            # The dupefilter has seen these; they may have been in flight when the crawl stopped
+            for stream, token in pending.items():
+                yield self.page_request(stream, token, dont_filter=True)
+        elif not self.tokens:
+            yield scrapy.Request(
+                url=self.categories_url,
+                callback=self.parse_categories,
+                errback=self.categories_failed,
+                headers=self.headers
+            )
+
+    def parse_categories(self, response):
+        try:
+            categories = json.loads(response.text).get('entities', {}).get('category', {})
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse categories JSON: {e}")
+            categories = {}
+        # Parent categories list their children's products, so only leaves are crawled
+        leaves = [category_id for category_id, category in categories.items()
+                  if isinstance(category, dict) and not category.get('children')]
+        if not leaves:
+            self.logger.warning("No categories found, falling back to a single stream")
+            leaves = [ALL_PRODUCTS]
+        self.logger.info(f"Fanning out over {len(leaves)} category streams")
+        requests = [self.page_request(stream) for stream in leaves]
+        self.seen_ids.flush()
+        checkpoint(self)
+        yield from requests
+
+    def categories_failed(self, failure):
+        self.logger.warning(f"Category listing failed ({failure.getErrorMessage()}), falling back to a single stream")
+        request = self.page_request(ALL_PRODUCTS)
+        self.seen_ids.flush()
+        checkpoint(self)
+        return [request]
+
+    def page_request(self, stream, token=None, dont_filter=False):
+        url = self.base_url
+        if stream != ALL_PRODUCTS:
+            url = add_or_replace_parameter(url, self.category_param, stream)
+        if token:
+            url = add_or_replace_parameter(url, 'pageToken', token)
+        self.tokens[stream] = token or ""
+        return scrapy.Request(
+            url=url,
             callback=self.parse,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'application/json, text/plain, */*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Referer': 'https://courses.monoprix.fr/',
-            }
+            headers=self.headers,
+            cb_kwargs={'stream': stream},
+            dont_filter=dont_filter
         )
-    
-    def parse(self, response):
+
+    def parse(self, response, stream=ALL_PRODUCTS):
         try:
             data = json.loads(response.text)
             entities = data.get('entities', {}).get('product', {})
             
-            self.logger.info(f"Found {len(entities)} products on this page")
+            self.logger.info(f"Found {len(entities)} products on this page of {stream}")
             
             # Parse each product - based on actual JSON structure
             for product_id, product in entities.items():
+                if product_id in self.seen_ids:
+                    continue
+                self.seen_ids.add(product_id)
+
                 # Extract price info
                 price_info = product.get('price', {})
                 current_price = None
@@ -59,33 +159,38 @@ class MonoprixAPISimpleSpider(scrapy.Spider):
                 promo_info = product.get('offer', {})
                 promo = promo_info.get('description') if isinstance(promo_info, dict) else None
                 
-                yield {
-                    'name': name,
-                    'brand': brand,
-                    'price': current_price,
-                    'size': size,
-                    'unit_price': unit_amount,
-                    'unit_label': unit_label,  # e.g., "€/kg price per litre"
-                    'promo': promo 
-                }
+                loader = ProductLoader()
+                loader.add_value('name', name)
+                loader.add_value('brand', brand)
+                loader.add_value('price', current_price)
+                loader.add_value('size', size)
+                loader.add_value('unit_price', unit_amount)
+                loader.add_value('unit_label', unit_label)  # e.g., "€/kg price per litre"
+                loader.add_value('promo', promo)
+                loader.add_value('market', self.market)
+                yield loader.load_item()
             
             # Check for next page
             next_page_token = data.get('result', {}).get('nextPageToken')
             if next_page_token:
-                next_url = f"{self.base_url}?pageToken={next_page_token}"
-                yield scrapy.Request(
-                    url=next_url,
-                    callback=self.parse,
-                    headers=self.headers
-                )
+                request = self.page_request(stream, next_page_token)
+                self.seen_ids.flush()
+                checkpoint(self)
+                yield request
             else:
-                self.logger.info("Finished scraping all pages!")
+                self.tokens[stream] = None
+                self.seen_ids.flush()
+                checkpoint(self)
+                self.logger.info(f"Finished scraping all pages of {stream}!")
                 
         except json.JSONDecodeError as e:
             self.logger.error(f"Failed to parse JSON: {e}")
         except Exception as e:
             self.logger.error(f"Error: {e}")
     
+    def closed(self, reason):
+        self.seen_ids.close()
+
     @property
     def headers(self):
         return {
@@ -0,0 +1,201 @@
+"""Adaptive per-domain concurrency and delay (AIMD), replacing AutoThrottle.
+
+Every downloaded response adjusts its download slot (one per domain):
+
+* a 429/503 or a Cloudflare challenge halves the slot's concurrency and
+  doubles its delay, at most once per latency window; a Retry-After header
+  additionally pauses the slot for the time the server asked for;
+* a latency well above the best of the domain's last few responses cuts
+  concurrency by a quarter (the server is queueing our requests);
+* any other response adds roughly one request of concurrency per window
+  and shrinks the delay, up to CONCURRENT_REQUESTS_PER_DOMAIN and down to
+  DOWNLOAD_DELAY, which stay the hard limits.
+
+What each domain converged to is saved to .scrapy/<ADAPTIVE_THROTTLE_DIR>/
+profiles.json when the spider closes and used as the starting point of the
+next crawl. The latency baseline is not: it is rebuilt from each crawl's
+own responses, so a site that got slower doesn't look congested forever.
+Enabled by ADAPTIVE_THROTTLE_ENABLED.
+"""
+import json
+import logging
+import os
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+THROTTLED_STATUSES = (429, 503)
+# Cloudflare marks its challenge pages with this header
+CHALLENGE_HEADER = b"cf-mitigated"
+# debug_spider.py's heuristic, restricted to refusals so ordinary pages
+# served through Cloudflare's CDN don't count
+CHALLENGE_STATUSES = (403, 429, 503)
+CHALLENGE_MARKER = b"cloudflare"
+
+
+def is_challenge(response):
+    if response.headers.get(CHALLENGE_HEADER, b"").lower() == b"challenge":
+        return True
+    return response.status in CHALLENGE_STATUSES and CHALLENGE_MARKER in response.body[:65536].lower()
+
+
+def retry_after(response):
+    """Seconds the server asked us to wait, or None"""
+    value = response.headers.get(b"Retry-After")
+    if not value:
+        return None
+    value = value.decode("latin-1").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainProfile:
+    def __init__(self, concurrency, delay, latency=None, window=50):
+        self.concurrency = concurrency
+        self.delay = delay
+        # Exponentially weighted latency, and the last few raw samples
+        self.latency = latency
+        self.recent_latencies = deque(maxlen=window)
+        self.last_decrease = 0.0
+        # Set from Retry-After; no request goes out before it
+        self.paused_until = 0.0
+
+    def as_dict(self):
+        return {
+            "concurrency": round(self.concurrency, 2),
+            "delay": round(self.delay, 3),
+            "latency": self.latency and round(self.latency, 3),
+        }
+
+    @property
+    def best_latency(self):
+        """Lowest latency of the recent samples; follows the site up and down"""
+        return min(self.recent_latencies)
+
+
+class AdaptiveThrottle:
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_THROTTLE_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.debug = settings.getbool("ADAPTIVE_THROTTLE_DEBUG")
+        self.min_delay = settings.getfloat("DOWNLOAD_DELAY")
+        self.max_delay = settings.getfloat("ADAPTIVE_THROTTLE_MAX_DELAY", 60.0)
+        self.start_delay = max(self.min_delay, settings.getfloat("ADAPTIVE_THROTTLE_START_DELAY", 1.0))
+        self.min_concurrency = 1
+        self.max_concurrency = settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.start_concurrency = min(self.max_concurrency, settings.getint("ADAPTIVE_THROTTLE_START_CONCURRENCY", 2))
+        self.latency_tolerance = settings.getfloat("ADAPTIVE_THROTTLE_LATENCY_TOLERANCE", 3.0)
+        self.latency_window = settings.getint("ADAPTIVE_THROTTLE_LATENCY_WINDOW", 50)
+        self.path = os.path.join(data_path(settings.get("ADAPTIVE_THROTTLE_DIR", "throttle"), createdir=True), "profiles.json")
+        self.saved = {}
+        self.profiles = {}
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(self.response_downloaded, signal=signals.response_downloaded)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        self.saved = self.load_profiles()
+
+    def spider_closed(self, spider):
+        if not self.profiles:
+            return
+        # Other spiders may have saved their domains meanwhile; keep them
+        profiles = self.load_profiles()
+        profiles.update({key: profile.as_dict() for key, profile in self.profiles.items()})
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profiles, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def load_profiles(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def profile(self, key):
+        if key not in self.profiles:
+            saved = self.saved.get(key)
+            if saved:
+                # Resume from last crawl's rate, within today's limits
+                self.profiles[key] = DomainProfile(
+                    min(max(saved["concurrency"], self.min_concurrency), self.max_concurrency),
+                    min(max(saved["delay"], self.min_delay), self.max_delay),
+                    saved.get("latency"),
+                    window=self.latency_window,
+                )
+            else:
+                self.profiles[key] = DomainProfile(
+                    self.start_concurrency, self.start_delay, window=self.latency_window
+                )
+        return self.profiles[key]
+
+    def response_downloaded(self, response, request, spider):
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key) if key else None
+        latency = request.meta.get("download_latency")
+        if slot is None or latency is None:
+            return
+        profile = self.profile(key)
+        now = time.monotonic()
+        window = max(profile.latency or latency, self.min_delay, 0.5)
+
+        challenge = is_challenge(response)
+        if response.status in THROTTLED_STATUSES or challenge:
+            self.stats.inc_value("throttle/backoff")
+            if challenge:
+                self.stats.inc_value("throttle/challenge")
+            if now - profile.last_decrease > window:
+                self.decrease(profile, now, factor=0.5)
+                profile.delay = min(self.max_delay, max(profile.delay * 2, self.start_delay))
+            pause = retry_after(response)
+            if pause:
+                self.stats.inc_value("throttle/retry_after")
+                profile.paused_until = max(profile.paused_until, now + min(pause, self.max_delay))
+            self.apply(slot, profile, now)
+        else:
+            self.observe(profile, latency)
+            if latency > profile.best_latency * self.latency_tolerance:
+                if now - profile.last_decrease > window:
+                    self.decrease(profile, now, factor=0.75)
+            else:
+                profile.concurrency = min(self.max_concurrency, profile.concurrency + 1 / profile.concurrency)
+                profile.delay = max(self.min_delay, profile.delay * 0.9)
+            self.apply(slot, profile, now)
+
+        if self.debug:
+            logger.info(
+                f"slot: {key} | status: {response.status} | latency: {latency * 1000:.0f} ms | "
+                f"concurrency: {slot.concurrency} | delay: {slot.delay * 1000:.0f} ms",
+                extra={"spider": spider},
+            )
+
+    def observe(self, profile, latency):
+        profile.latency = latency if profile.latency is None else 0.8 * profile.latency + 0.2 * latency
+        profile.recent_latencies.append(latency)
+
+    def decrease(self, profile, now, factor):
+        profile.concurrency = max(self.min_concurrency, profile.concurrency * factor)
+        profile.last_decrease = now
+
+    def apply(self, slot, profile, now):
+        slot.concurrency = max(self.min_concurrency, int(profile.concurrency))
+        # The slot's delay counts from its last request, which is close enough to now
+        slot.delay = max(profile.delay, profile.paused_until - now)
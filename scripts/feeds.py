@@ -0,0 +1,80 @@
+"""Incremental readers for Scrapy feed exports.
+
+Both JSON Lines (``-o items.jl``) and JSON array (``-o items.json``) feeds
+are read in fixed-size chunks and yielded one record at a time, so memory
+stays bounded by the largest single record rather than the file size.
+"""
+import json
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16
+FEED_SUFFIXES = ('.json', '.jl', '.jsonl')
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = ' \t\r\n,'
+
+
+def iter_json_lines(f):
+    """Yield one record per non-blank line"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array of objects without loading it whole"""
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Expected a JSON array, found {buffer[pos]!r}")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, pos = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Record straddles the chunk boundary: read more below
+                if eof:
+                    raise
+            else:
+                yield record
+                continue
+
+        if eof:
+            if started:
+                raise ValueError("Unterminated JSON array")
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_records(f):
+    """Sniff the feed format from its first character and stream its records"""
+    head = f.read(1)
+    while head and head.isspace():
+        head = f.read(1)
+    f.seek(0)
+    if head == '[':
+        return iter_json_array(f)
+    return iter_json_lines(f)
+
+
+def list_feeds(directory):
+    """Feed files in ``directory``, in a stable order"""
+    return sorted(
+        path for path in Path(directory).iterdir()
+        if path.suffix in FEED_SUFFIXES and path.is_file()
+    )
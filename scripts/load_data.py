@@ -1,10 +1,30 @@
-import json
+import argparse
+import csv
+import io
 import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path 
 
+from feeds import iter_records, list_feeds
+from schema import COPY_QUERY, STAGING_COLUMNS, create_schema, create_staging_table, finish_load, merge_staging, observe_staging
+
+# Rows per COPY round-trip; a failing batch is rolled back on its own
+BATCH_SIZE = int(os.getenv('LOAD_BATCH_SIZE', '5000'))
+# Parallel loader processes, each holding one connection
+LOAD_WORKERS = int(os.getenv('LOAD_WORKERS', str(min(os.cpu_count() or 1, 4))))
+MERGE_RETRIES = 3
+
+def get_connection():
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'scraped_data'),
+        user=os.getenv('DB_USER', 'myuser'),
+        password=os.getenv('DB_PASSWORD', 'mypassword')
+    )
+
 def wait_for_postgres():
     max_retries = 30
     for i in range(max_retries):
@@ -23,71 +43,180 @@ def wait_for_postgres():
             time.sleep(2)
     return False
 
-def main(path):
+def iter_products(path):
+    """Yield product dicts from a scrape output file (JSON array or JSON Lines)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_records(f)
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def copy_batch(cursor, products):
+    """Stream one batch into the staging table as CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for product in products:
+        writer.writerow([product.get(column) for column in STAGING_COLUMNS])
+    buffer.seek(0)
+    cursor.copy_expert(COPY_QUERY, buffer)
+
+def market_for(path):
+    """Market recorded for rows that don't carry one, e.g. data/franprix.json -> franprix"""
+    return Path(path).stem.split('_')[0]
+
+def load_file(conn, path):
+    """COPY a file into staging in batches, then upsert it into products"""
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    create_staging_table(cursor)
+
+    staged_count = 0
+    failed_count = 0
+    for batch in batched(iter_products(path), BATCH_SIZE):
+        cursor.execute("SAVEPOINT copy_batch")
+        try:
+            copy_batch(cursor, batch)
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT copy_batch")
+            failed_count += len(batch)
+            print(f"Skipping batch of {len(batch)} products from {path}: {e}")
+            continue
+        cursor.execute("RELEASE SAVEPOINT copy_batch")
+        staged_count += len(batch)
+
+    # Casting and filtering happen set-wise in SQL, not per row in Python
+    inserted_count, updated_count = merge_with_retry(cursor, market_for(path))
+    observed_count = observe_staging(cursor, market_for(path))
+    conn.commit()
+    cursor.close()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    size_mb = os.path.getsize(path) / 1e6
+    print(
+        f"{path}: staged {staged_count}, inserted {inserted_count}, "
+        f"updated {updated_count}, failed {failed_count}, observed {observed_count} prices "
+        f"in {elapsed:.2f}s ({staged_count / elapsed:,.0f} rows/s, {size_mb / elapsed:.1f} MB/s)"
+    )
+    return {
+        'path': str(path),
+        'staged': staged_count,
+        'inserted': inserted_count,
+        'updated': updated_count,
+        'failed': failed_count,
+        'observed': observed_count,
+        'seconds': elapsed,
+        'error': None,
+    }
+
+def load_file_or_report(conn, path):
+    """load_file, with a failing file rolled back and reported instead of ending the run"""
+    started = time.perf_counter()
+    try:
+        return load_file(conn, path)
+    except (psycopg2.Error, OSError, ValueError) as e:
+        if not conn.closed:
+            conn.rollback()
+        print(f"Failed to load {path}: {e}")
+        return {
+            'path': str(path),
+            'staged': 0,
+            'inserted': 0,
+            'updated': 0,
+            'failed': 0,
+            'observed': 0,
+            'seconds': time.perf_counter() - started,
+            'error': str(e),
+        }
+
+def merge_with_retry(cursor, market):
+    """Upsert the staged rows, retrying if a concurrent loader deadlocks us"""
+    for attempt in range(1, MERGE_RETRIES + 1):
+        cursor.execute("SAVEPOINT merge_staging")
+        try:
+            counts = merge_staging(cursor, market)
+        except psycopg2.errors.DeadlockDetected:
+            cursor.execute("ROLLBACK TO SAVEPOINT merge_staging")
+            if attempt == MERGE_RETRIES:
+                raise
+            time.sleep(0.1 * attempt)
+            continue
+        cursor.execute("RELEASE SAVEPOINT merge_staging")
+        return counts
+
+# Each worker process keeps a single connection for all the files it loads
+_worker_conn = None
+
+def _init_worker():
+    global _worker_conn
+    _worker_conn = get_connection()
+
+def _load_in_worker(path):
+    return load_file_or_report(_worker_conn, path)
+
+def load_files(paths, workers):
+    """Load ``paths`` on ``workers`` processes; results come back in input order"""
+    if workers <= 1 or len(paths) <= 1:
+        conn = get_connection()
+        try:
+            return [load_file_or_report(conn, path) for path in paths]
+        finally:
+            conn.close()
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), initializer=_init_worker) as pool:
+        return list(pool.map(_load_in_worker, paths))
+
+def print_report(results, elapsed):
+    print("\nLoad report")
+    for result in sorted(results, key=lambda r: r['path']):
+        if result['error']:
+            print(f"  {result['path']}: FAILED, {result['error']}")
+            continue
+        print(
+            f"  {result['path']}: {result['staged']} staged, {result['inserted']} inserted, "
+            f"{result['updated']} updated, {result['failed']} failed ({result['seconds']:.2f}s)"
+        )
+    staged_count = sum(result['staged'] for result in results)
+    failed_files = sum(1 for result in results if result['error'])
+    if failed_files:
+        print(f"  {failed_files} of {len(results)} files failed")
+    print(f"  {len(results)} files, {staged_count} rows in {elapsed:.2f}s ({staged_count / max(elapsed, 1e-9):,.0f} rows/s)")
+
+def main(paths, workers=LOAD_WORKERS):
     if not wait_for_postgres():
         print("Failed to connect to PostgreSQL")
         exit(1)
     
     # Connect to database
-    conn = psycopg2.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        database=os.getenv('DB_NAME', 'scraped_data'),
-        user=os.getenv('DB_USER', 'myuser'),
-        password=os.getenv('DB_PASSWORD', 'mypassword')
-    )
-    
+    conn = get_connection()
     cursor = conn.cursor()
     
-    # Create table matching your JSON structure
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id SERIAL PRIMARY KEY,
-            name TEXT,
-            brand TEXT,
-            price DECIMAL(10,2),
-            unit_price DECIMAL(10,2),
-            unit_label TEXT,
-            size TEXT,
-            promo TEXT,
-            market TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    # Load JSON data
-    with open(path, 'r', encoding='utf-8') as f:
-        products = json.load(f)
-    
-    # Insert data
-    insert_query = """
-        INSERT INTO products (name, brand, price, unit_price, unit_label, size, promo, market) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    
-    inserted_count = 0
-    for product in products:
-        try:
-            cursor.execute(insert_query, (
-                product.get('name'),
-                product.get('brand'),
-                float(product.get('price', 0)) if product.get('price') else None,
-                float(product.get('unit_price', 0)) if product.get('unit_price') else None,
-                product.get('unit_label'),
-                product.get('size'),
-                product.get('promo'),
-                product.get('market')
-            ))
-            inserted_count += 1
-        except Exception as e:
-            print(f"Error inserting product {product.get('name', 'Unknown')}: {e}")
-            continue
-    
+    # Create tables, search extensions and indexes once, before any worker starts
+    create_schema(cursor)
     conn.commit()
+
+    started = time.perf_counter()
+    results = load_files(paths, workers)
+    print_report(results, time.perf_counter() - started)
+    changed_count = sum(result['inserted'] + result['updated'] for result in results)
+
+    # Unchanged reloads keep the API caches warm. Files that loaded before
+    # another one failed are committed, so this runs regardless.
+    if changed_count:
+        finish_load(cursor)
+        conn.commit()
     cursor.close()
     conn.close()
     
-    print(f"Successfully inserted {inserted_count} products into the database!")
+    print(f"Successfully loaded {changed_count} new or changed products into the database!")
+    if any(result['error'] for result in results):
+        exit(1)
 
 if __name__ == "__main__":
-    pathlist = Path("data").glob("*.json")
-    for path in pathlist:
-        main(path)
+    parser = argparse.ArgumentParser(description="Load scraped product feeds into PostgreSQL")
+    parser.add_argument("paths", nargs="*", type=Path, help="Feed files (default: every feed in --data-dir)")
+    parser.add_argument("--data-dir", default="data", help="Directory scanned for feeds")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS, help="Parallel loader processes")
+    args = parser.parse_args()
+    main(args.paths or list_feeds(args.data_dir), workers=args.workers)
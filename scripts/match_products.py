@@ -0,0 +1,206 @@
+"""Offline cross-market product matching.
+
+Groups products from different markets that are the same item, so that
+``GET /compare/...`` is a lookup in ``match_groups``/``product_matches``
+instead of fuzzy matching at request time.
+
+Pipeline:
+
+1. normalise each product into name tokens (brand, size and stopwords
+   removed) plus its canonical size (``quantity``/``quantity_unit``
+   computed by the loader, e.g. ``0.5kg``);
+2. block on size and on each product's two rarest tokens, so only
+   products sharing a block are ever compared;
+3. score candidate pairs from different markets with a token Jaccard
+   similarity (plus a bonus when brands agree) and union pairs above
+   ``MATCH_THRESHOLD``, never letting a group hold two products of one
+   market.
+"""
+import re
+import time
+from collections import defaultdict
+from itertools import combinations
+
+from psycopg2.extras import execute_values
+
+from load_data import get_connection, wait_for_postgres
+from schema import create_schema
+
+MATCH_THRESHOLD = 0.6
+BRAND_BONUS = 0.15
+# Blocks bigger than this are too generic to be useful ("lait", "bio")
+MAX_BLOCK_SIZE = 500
+
+STOPWORDS = {
+    'a', 'au', 'aux', 'avec', 'de', 'des', 'du', 'en', 'et', 'la', 'le', 'les',
+    'l', 'd', 'pour', 'sans', 'sur', 'x',
+}
+
+def size_key(quantity, quantity_unit):
+    """0.5000, 'kg' -> '0.5kg'; unknown sizes share the None block"""
+    if quantity is None or quantity_unit is None:
+        return None
+    return f"{float(quantity):g}{quantity_unit}"
+
+
+def name_tokens(name_key, brand_key, size):
+    """Distinctive tokens of a product name once brand, size and stopwords are gone"""
+    tokens = set(name_key.split()) - set((brand_key or '').split()) - STOPWORDS
+    tokens = {token for token in tokens if not token.isdigit()}
+    if size:
+        tokens -= set(re.findall(r'[a-z]+|\d+', size.lower()))
+    return frozenset(tokens)
+
+
+def similarity(a, b):
+    union = len(a['tokens'] | b['tokens'])
+    score = len(a['tokens'] & b['tokens']) / union if union else 0.0
+    if a['brand'] and a['brand'] == b['brand']:
+        score += BRAND_BONUS
+    return min(score, 1.0)
+
+
+class Groups:
+    """Union-find that refuses merges putting two products of one market together"""
+
+    def __init__(self, products):
+        self.parent = {product['id']: product['id'] for product in products}
+        self.markets = {product['id']: {product['market']} for product in products}
+
+    def find(self, product_id):
+        while self.parent[product_id] != product_id:
+            self.parent[product_id] = self.parent[self.parent[product_id]]
+            product_id = self.parent[product_id]
+        return product_id
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b or self.markets[root_a] & self.markets[root_b]:
+            return False
+        self.parent[root_b] = root_a
+        self.markets[root_a] |= self.markets.pop(root_b)
+        return True
+
+
+def load_products(cursor):
+    cursor.execute("""
+        SELECT id, market, name, match_key(name), match_key(brand), size, quantity, quantity_unit
+        FROM products
+        WHERE name IS NOT NULL
+    """)
+    products = []
+    for product_id, market, name, name_key, brand_key, size, quantity, quantity_unit in cursor:
+        products.append({
+            'id': product_id,
+            'market': market,
+            'name': name,
+            'brand': brand_key,
+            'size': size_key(quantity, quantity_unit),
+            'tokens': name_tokens(name_key, brand_key, size),
+        })
+    return products
+
+
+def candidate_pairs(products):
+    """Pairs sharing a (size, rare token) block, from different markets"""
+    frequency = defaultdict(int)
+    for product in products:
+        for token in product['tokens']:
+            frequency[token] += 1
+
+    blocks = defaultdict(list)
+    for product in products:
+        rarest = sorted(product['tokens'], key=lambda token: (frequency[token], token))[:2]
+        for token in rarest:
+            blocks[(product['size'], token)].append(product)
+
+    seen = set()
+    for block in blocks.values():
+        if len(block) > MAX_BLOCK_SIZE:
+            continue
+        for a, b in combinations(block, 2):
+            if a['market'] == b['market']:
+                continue
+            pair = (a['id'], b['id']) if a['id'] < b['id'] else (b['id'], a['id'])
+            if pair not in seen:
+                seen.add(pair)
+                yield a, b
+
+
+def match(products):
+    """Return ``{root_id: [(product, score), ...]}`` match groups"""
+    scored = []
+    for a, b in candidate_pairs(products):
+        score = similarity(a, b)
+        if score >= MATCH_THRESHOLD:
+            scored.append((score, a['id'], b['id']))
+
+    # Strongest pairs first so weak links can't block a better match
+    groups = Groups(products)
+    best = defaultdict(float)
+    for score, a, b in sorted(scored, reverse=True):
+        if groups.union(a, b):
+            best[a] = max(best[a], score)
+            best[b] = max(best[b], score)
+
+    members = defaultdict(list)
+    for product in products:
+        members[groups.find(product['id'])].append((product, best.get(product['id'], 1.0)))
+    return members
+
+
+def save_groups(conn, members):
+    """Replace the stored match index with ``members``"""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE product_matches, match_groups RESTART IDENTITY")
+    # Ids are assigned here (the table was just truncated) so match rows can
+    # reference their group without a round-trip per group.
+    group_rows = []
+    match_rows = []
+    for group_id, group in enumerate(members.values(), start=1):
+        label = min((product['name'] for product, _ in group), key=len)
+        group_rows.append((group_id, label, label, len({product['market'] for product, _ in group})))
+        match_rows.extend((product['id'], group_id, score) for product, score in group)
+    execute_values(
+        cursor,
+        "INSERT INTO match_groups (id, label, match_key, market_count) VALUES %s",
+        group_rows,
+        template="(%s, %s, match_key(%s), %s)",
+        page_size=5000,
+    )
+    cursor.execute("SELECT setval('match_groups_id_seq', GREATEST(%s, 1))", (len(group_rows),))
+    execute_values(
+        cursor,
+        "INSERT INTO product_matches (product_id, group_id, score) VALUES %s",
+        match_rows,
+        page_size=5000,
+    )
+    conn.commit()
+    cursor.close()
+
+
+def main():
+    if not wait_for_postgres():
+        print("Failed to connect to PostgreSQL")
+        exit(1)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    create_schema(cursor)
+    conn.commit()
+
+    started = time.perf_counter()
+    products = load_products(cursor)
+    members = match(products)
+    save_groups(conn, members)
+    conn.close()
+
+    cross_market = sum(1 for group in members.values() if len(group) > 1)
+    print(
+        f"Matched {len(products)} products into {len(members)} groups "
+        f"({cross_market} spanning several markets) in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""Database schema for the scraped product catalog.
+
+Everything here is idempotent so it can run at the start of every load.
+"""
+from datetime import date
+
+SCHEMA_STATEMENTS = [
+    # Search support: trigram matching on accent-stripped, lower-cased text
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() is only STABLE; indexes need an IMMUTABLE wrapper with the
+    # dictionary pinned explicitly.
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    # Lenient price parser used when merging staged text: "1,99 €" -> 1.99,
+    # anything unparseable -> NULL instead of failing the whole batch.
+    """
+    CREATE OR REPLACE FUNCTION parse_price(text) RETURNS numeric AS $$
+        SELECT CASE
+            WHEN cleaned ~ '^[0-9]{1,8}([.][0-9]+)?$' THEN round(cleaned::numeric, 2)
+        END
+        FROM (
+            SELECT replace(regexp_replace($1, '[^0-9,.]', '', 'g'), ',', '.') AS cleaned
+        ) AS s
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    # Unit normalisation: sizes ("6 x 33cl", "1,5 L", "x4") and unit labels
+    # ("€/kg", "/100g") are turned into a canonical quantity in kg, l or
+    # unit and a price per canonical unit.
+    r"""
+    CREATE OR REPLACE FUNCTION parse_size(size text, OUT quantity numeric, OUT unit text) AS $$
+    DECLARE
+        normalized text := replace(lower(f_unaccent(size)), ',', '.');
+        m text[];
+        multiplier numeric := 1;
+    BEGIN
+        m := regexp_match(normalized, '([0-9]+)\s*x\s*([0-9]+(?:[.][0-9]+)?)\s*(kg|g|mg|l|cl|ml)\y');
+        IF m IS NOT NULL THEN
+            multiplier := m[1]::numeric;
+            m := ARRAY[m[2], m[3]];
+        ELSE
+            m := regexp_match(normalized, '([0-9]+(?:[.][0-9]+)?)\s*(kg|g|mg|l|cl|ml)\y');
+        END IF;
+        IF m IS NOT NULL THEN
+            quantity := multiplier * m[1]::numeric * CASE m[2]
+                WHEN 'kg' THEN 1 WHEN 'g' THEN 0.001 WHEN 'mg' THEN 0.000001
+                WHEN 'l' THEN 1 WHEN 'cl' THEN 0.01 WHEN 'ml' THEN 0.001
+            END;
+            unit := CASE WHEN m[2] IN ('kg', 'g', 'mg') THEN 'kg' ELSE 'l' END;
+            RETURN;
+        END IF;
+        m := regexp_match(normalized, '(?:\yx\s*([0-9]+)\y|\y([0-9]+)\s*(?:x\y|pieces?|pcs?|unites?|oeufs?|sachets?|capsules?|rouleaux?))');
+        IF m IS NOT NULL THEN
+            quantity := coalesce(m[1], m[2])::numeric;
+            unit := 'unit';
+        END IF;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    # The unit must be a whole word, or follow a number ("/100g"): "prix au
+    # kilo" is per kg, not per "u" of "au".
+    r"""
+    CREATE OR REPLACE FUNCTION parse_unit_label(label text, OUT unit text, OUT per_quantity numeric) AS $$
+    DECLARE
+        normalized text := replace(lower(f_unaccent(label)), ',', '.');
+        m text[];
+        amount numeric;
+    BEGIN
+        m := regexp_match(normalized, '([0-9]+(?:[.][0-9]+)?)?\s*(?<![a-z])(kilogramme|kilo|kg|g|mg|litre|l|cl|ml|piece|unite|u)\y');
+        IF m IS NULL THEN
+            RETURN;
+        END IF;
+        amount := coalesce(m[1]::numeric, 1);
+        unit := CASE WHEN m[2] IN ('kilogramme', 'kilo', 'kg', 'g', 'mg') THEN 'kg'
+                     WHEN m[2] IN ('litre', 'l', 'cl', 'ml') THEN 'l'
+                     ELSE 'unit' END;
+        per_quantity := amount * CASE m[2]
+            WHEN 'g' THEN 0.001 WHEN 'mg' THEN 0.000001
+            WHEN 'cl' THEN 0.01 WHEN 'ml' THEN 0.001
+            ELSE 1
+        END;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    # Prefer the retailer's own unit price when its label parses and agrees
+    # with the size; fall back to price / quantity. Rows from the scraper
+    # arrive with the size already parsed (known_quantity, known_unit);
+    # parse_size() only fills in for rows that don't.
+    "DROP FUNCTION IF EXISTS normalize_units(numeric, numeric, text, text)",
+    """
+    CREATE OR REPLACE FUNCTION normalize_units(
+        price numeric, unit_price numeric, unit_label text, size text,
+        known_quantity numeric DEFAULT NULL, known_unit text DEFAULT NULL,
+        OUT quantity numeric, OUT quantity_unit text, OUT price_per_unit numeric
+    ) AS $$
+    DECLARE
+        parsed_size record;
+        parsed_label record;
+    BEGIN
+        IF known_quantity IS NOT NULL AND known_unit IN ('kg', 'l', 'unit') THEN
+            quantity := known_quantity;
+            quantity_unit := known_unit;
+        ELSE
+            SELECT * INTO parsed_size FROM parse_size(size);
+            quantity := parsed_size.quantity;
+            quantity_unit := parsed_size.unit;
+        END IF;
+        IF unit_price IS NOT NULL AND unit_label IS NOT NULL THEN
+            SELECT * INTO parsed_label FROM parse_unit_label(unit_label);
+            IF parsed_label.per_quantity > 0
+               AND (quantity_unit IS NULL OR quantity_unit = parsed_label.unit) THEN
+                quantity_unit := parsed_label.unit;
+                price_per_unit := round(unit_price / parsed_label.per_quantity, 4);
+                RETURN;
+            END IF;
+        END IF;
+        IF price IS NOT NULL AND quantity > 0 THEN
+            price_per_unit := round(price / quantity, 4);
+        END IF;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        id SERIAL PRIMARY KEY,
+        name TEXT,
+        brand TEXT,
+        price DECIMAL(10,2),
+        unit_price DECIMAL(10,2),
+        unit_label TEXT,
+        size TEXT,
+        promo TEXT,
+        market TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Natural key: market + normalised name/brand/size. Rows are upserted on
+    # it and content_hash lets reloads skip rows whose content is unchanged.
+    """
+    CREATE OR REPLACE FUNCTION product_key(name text, brand text, size text) RETURNS text AS $$
+        SELECT regexp_replace(
+            f_unaccent(lower(concat_ws('|', btrim(coalesce(name, '')), btrim(coalesce(brand, '')), btrim(coalesce(size, ''))))),
+            '[[:space:]]+', ' ', 'g'
+        )
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION product_hash(
+        name text, brand text, size text, price numeric, unit_price numeric, unit_label text, promo text
+    ) RETURNS text AS $$
+        SELECT md5(row(name, brand, size, price, unit_price, unit_label, promo)::text)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    """,
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS product_key TEXT",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash TEXT",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS quantity NUMERIC(12,4)",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS quantity_unit TEXT",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS price_per_unit NUMERIC(12,4)",
+    """
+    CREATE INDEX IF NOT EXISTS products_name_search_idx
+        ON products USING gin (f_unaccent(lower(name)) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS products_brand_trgm_idx
+        ON products USING gin (brand gin_trgm_ops)
+    """,
+    "CREATE INDEX IF NOT EXISTS products_market_idx ON products (market)",
+    # Keyset pagination on GET /products/products walks (name, id)
+    "CREATE INDEX IF NOT EXISTS products_name_id_idx ON products (name, id)",
+    # Sorting a unit class by price per kg/l/unit is one index scan
+    """
+    CREATE INDEX IF NOT EXISTS products_unit_price_idx
+        ON products (quantity_unit, price_per_unit, id)
+    """,
+    # Append-only price history, one row per product per load, partitioned
+    # by month. BRIN keeps time-range scans cheap on the append-ordered data;
+    # the btree serves per-product history lookups.
+    """
+    CREATE TABLE IF NOT EXISTS price_observations (
+        product_id INTEGER NOT NULL,
+        market TEXT NOT NULL,
+        price DECIMAL(10,2),
+        unit_price DECIMAL(10,2),
+        promo TEXT,
+        observed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) PARTITION BY RANGE (observed_at)
+    """,
+    # Catches rows outside every monthly partition, so an insert never fails
+    # for want of one; ensure_price_partition() moves them out again.
+    """
+    CREATE TABLE IF NOT EXISTS price_observations_default
+        PARTITION OF price_observations DEFAULT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION ensure_price_partition(observed_on date) RETURNS void AS $$
+    DECLARE
+        first_day date := date_trunc('month', observed_on)::date;
+        next_first date := (date_trunc('month', observed_on) + interval '1 month')::date;
+        partition_name text := 'price_observations_' || to_char(observed_on, 'YYYY_MM');
+    BEGIN
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            RETURN;
+        END IF;
+        -- Parallel loaders may get here together; only one creates it
+        PERFORM pg_advisory_xact_lock(hashtext('price_observations'));
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            RETURN;
+        END IF;
+        EXECUTE format('CREATE TABLE %I (LIKE price_observations INCLUDING DEFAULTS)', partition_name);
+        -- The month's rows that already landed in the default partition
+        EXECUTE format(
+            'WITH moved AS (
+                 DELETE FROM price_observations_default
+                 WHERE observed_at >= %L AND observed_at < %L
+                 RETURNING *
+             )
+             INSERT INTO %I SELECT * FROM moved',
+            first_day, next_first, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE price_observations ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, first_day, next_first
+        );
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS price_observations_observed_at_brin
+        ON price_observations USING brin (observed_at)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS price_observations_product_idx
+        ON price_observations (product_id, observed_at)
+    """,
+    # Cross-market product matching, precomputed by scripts/match_products.py.
+    # match_key() is the sorted set of accent-free lowercase word tokens, so
+    # the API and the matcher agree on how a name is normalised.
+    """
+    CREATE OR REPLACE FUNCTION match_key(text) RETURNS text AS $$
+        SELECT array_to_string(ARRAY(
+            SELECT DISTINCT token
+            FROM unnest(regexp_split_to_array(f_unaccent(lower($1)), '[^a-z0-9]+')) AS token
+            WHERE token <> ''
+            ORDER BY token
+        ), ' ')
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS match_groups (
+        id SERIAL PRIMARY KEY,
+        label TEXT NOT NULL,
+        match_key TEXT NOT NULL,
+        market_count INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS match_groups_key_idx ON match_groups (match_key)",
+    """
+    CREATE INDEX IF NOT EXISTS match_groups_key_trgm_idx
+        ON match_groups USING gin (match_key gin_trgm_ops)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS product_matches (
+        product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE,
+        group_id INTEGER NOT NULL REFERENCES match_groups (id) ON DELETE CASCADE,
+        score REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS product_matches_group_idx ON product_matches (group_id)",
+    # Single-row counter bumped after every load; the API keys its caches on it
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "INSERT INTO data_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING",
+    # Load path, shared by scripts/load_data.py and the Scrapy PostgresPipeline:
+    # prepare_products_staging() -> COPY products_staging -> merge, observe ->
+    # finish_products_load(). plpgsql so the bodies may reference the
+    # per-session temp table before it exists.
+    """
+    CREATE OR REPLACE FUNCTION prepare_products_staging() RETURNS void AS $$
+    BEGIN
+        CREATE TEMP TABLE IF NOT EXISTS products_staging (
+            name TEXT,
+            brand TEXT,
+            price TEXT,
+            unit_price TEXT,
+            unit_label TEXT,
+            size TEXT,
+            promo TEXT,
+            market TEXT,
+            quantity TEXT,
+            quantity_unit TEXT
+        );
+        TRUNCATE products_staging;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # Upsert on the natural key. DISTINCT ON collapses duplicates within a
+    # batch (ON CONFLICT may not touch a row twice) and the WHERE on the
+    # conflict branch leaves rows whose content hash is unchanged untouched.
+    """
+    CREATE OR REPLACE FUNCTION merge_products_staging(
+        default_market text, OUT inserted_count bigint, OUT updated_count bigint
+    ) AS $$
+    #variable_conflict use_column
+    BEGIN
+        WITH staged AS (
+            SELECT name, brand, parse_price(price) AS price, parse_price(unit_price) AS unit_price,
+                   unit_label, size, promo, COALESCE(market, default_market) AS market,
+                   CASE WHEN quantity ~ '^[0-9]+([.][0-9]+)?([eE][-+]?[0-9]+)?$'
+                        THEN quantity::numeric END AS known_quantity,
+                   quantity_unit AS known_unit
+            FROM products_staging
+            WHERE name IS NOT NULL
+        ),
+        normalized AS (
+            SELECT staged.*, u.quantity, u.quantity_unit, u.price_per_unit
+            FROM staged
+            CROSS JOIN LATERAL normalize_units(
+                staged.price, staged.unit_price, staged.unit_label, staged.size,
+                staged.known_quantity, staged.known_unit
+            ) AS u
+        ),
+        upserted AS (
+            INSERT INTO products AS p (
+                name, brand, price, unit_price, unit_label, size, promo, market,
+                quantity, quantity_unit, price_per_unit, product_key, content_hash
+            )
+            SELECT DISTINCT ON (market, product_key(name, brand, size))
+                name, brand, price, unit_price, unit_label, size, promo, market,
+                quantity, quantity_unit, price_per_unit,
+                product_key(name, brand, size),
+                product_hash(name, brand, size, price, unit_price, unit_label, promo)
+            FROM normalized
+            ORDER BY market, product_key(name, brand, size)
+            ON CONFLICT (market, product_key) DO UPDATE SET
+                name = EXCLUDED.name,
+                brand = EXCLUDED.brand,
+                price = EXCLUDED.price,
+                unit_price = EXCLUDED.unit_price,
+                unit_label = EXCLUDED.unit_label,
+                size = EXCLUDED.size,
+                promo = EXCLUDED.promo,
+                quantity = EXCLUDED.quantity,
+                quantity_unit = EXCLUDED.quantity_unit,
+                price_per_unit = EXCLUDED.price_per_unit,
+                content_hash = EXCLUDED.content_hash,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE p.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING (xmax = 0) AS was_inserted
+        )
+        SELECT count(*) FILTER (WHERE was_inserted), count(*) FILTER (WHERE NOT was_inserted)
+        INTO inserted_count, updated_count
+        FROM upserted;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # Record the current price of every staged product, changed or not
+    """
+    CREATE OR REPLACE FUNCTION observe_products_staging(default_market text) RETURNS bigint AS $$
+    DECLARE
+        observed bigint;
+    BEGIN
+        PERFORM ensure_price_partition(localtimestamp::date);
+        INSERT INTO price_observations (product_id, market, price, unit_price, promo)
+        SELECT p.id, p.market, p.price, p.unit_price, p.promo
+        FROM products p
+        JOIN (
+            SELECT DISTINCT COALESCE(s.market, default_market) AS market,
+                   product_key(s.name, s.brand, s.size) AS product_key
+            FROM products_staging s
+            WHERE s.name IS NOT NULL
+        ) AS staged ON p.market = staged.market AND p.product_key = staged.product_key;
+        GET DIAGNOSTICS observed = ROW_COUNT;
+        RETURN observed;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # After a load that changed rows: refresh derived data, then tell the API
+    """
+    CREATE OR REPLACE FUNCTION finish_products_load() RETURNS void AS $$
+    BEGIN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY brand_market_stats;
+        UPDATE data_version
+        SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+# One-off upgrade of tables created before natural keys existed: backfill the
+# key and hash, keep only the newest row per key, then enforce uniqueness.
+NATURAL_KEY_MIGRATION = [
+    "UPDATE products SET market = 'unknown' WHERE market IS NULL",
+    """
+    UPDATE products
+    SET product_key = product_key(name, brand, size),
+        content_hash = product_hash(name, brand, size, price, unit_price, unit_label, promo)
+    """,
+    """
+    DELETE FROM products older
+    USING products newer
+    WHERE older.market = newer.market
+      AND older.product_key = newer.product_key
+      AND older.id < newer.id
+    """,
+    "CREATE UNIQUE INDEX products_natural_key_idx ON products (market, product_key)",
+    "ALTER TABLE products ALTER COLUMN market SET NOT NULL",
+    "ALTER TABLE products ALTER COLUMN product_key SET NOT NULL",
+]
+
+
+# Backfill of canonical units for rows loaded before the columns existed
+UNIT_PRICE_MIGRATION = [
+    """
+    UPDATE products
+    SET (quantity, quantity_unit, price_per_unit) = (
+        SELECT u.quantity, u.quantity_unit, u.price_per_unit
+        FROM normalize_units(price, unit_price, unit_label, size) AS u
+    )
+    """,
+]
+
+
+# quantity / quantity_unit are the scraper's parsed size; feeds without
+# them are parsed by normalize_units() instead
+STAGING_COLUMNS = (
+    'name', 'brand', 'price', 'unit_price', 'unit_label', 'size', 'promo', 'market',
+    'quantity', 'quantity_unit',
+)
+COPY_QUERY = f"""
+    COPY products_staging ({", ".join(STAGING_COLUMNS)})
+    FROM STDIN WITH (FORMAT csv)
+"""
+# What the loader and the Scrapy pipeline call; missing ones mean an outdated schema
+LOAD_FUNCTIONS = (
+    'prepare_products_staging', 'merge_products_staging', 'observe_products_staging',
+    'finish_products_load', 'ensure_price_partition',
+)
+
+
+# Per brand and market statistics, plus one is_total rollup row per brand
+# (labelled market 'all', which a real market of that name can't collide
+# with). Built from products, so created only once the migrations above
+# have given every row a market. Refreshed CONCURRENTLY after loads, which
+# needs the unique index.
+BRAND_STATS_STATEMENTS = [
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS brand_market_stats AS
+    SELECT brand,
+           CASE WHEN GROUPING(market) = 1 THEN 'all' ELSE market END AS market,
+           GROUPING(market) = 1 AS is_total,
+           COUNT(*) AS product_count,
+           MIN(price) AS min_price,
+           ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY price)::numeric, 2) AS median_price,
+           MAX(price) AS max_price
+    FROM products
+    WHERE brand IS NOT NULL
+    GROUP BY GROUPING SETS ((brand, market), (brand))
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS brand_market_stats_key_idx
+        ON brand_market_stats (brand, is_total, market)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS brand_market_stats_top_idx
+        ON brand_market_stats (is_total, market, product_count DESC, brand)
+    """,
+]
+
+
+def create_schema(cursor):
+    """Create or upgrade tables, functions and indexes"""
+    cursor.execute("""
+        SELECT NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'products' AND column_name = 'price_per_unit'
+        )
+    """)
+    needs_unit_backfill = cursor.fetchone()[0]
+
+    for statement in SCHEMA_STATEMENTS:
+        cursor.execute(statement)
+
+    cursor.execute("SELECT to_regclass('products_natural_key_idx')")
+    if cursor.fetchone()[0] is None:
+        for statement in NATURAL_KEY_MIGRATION:
+            cursor.execute(statement)
+
+    if needs_unit_backfill:
+        for statement in UNIT_PRICE_MIGRATION:
+            cursor.execute(statement)
+
+    # Views from before is_total keyed the rollup on market alone
+    cursor.execute("""
+        SELECT to_regclass('brand_market_stats') IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = to_regclass('brand_market_stats') AND attname = 'is_total'
+        )
+    """)
+    if cursor.fetchone()[0]:
+        cursor.execute("DROP MATERIALIZED VIEW brand_market_stats")
+    for statement in BRAND_STATS_STATEMENTS:
+        cursor.execute(statement)
+
+    # observe_products_staging() creates the current month's partition on
+    # demand; creating next month's too keeps that off the load path.
+    this_month = date.today().replace(day=1)
+    create_price_partition(cursor, this_month)
+    create_price_partition(cursor, _next_month(this_month))
+
+
+def _next_month(month):
+    return date(month.year + (month.month // 12), month.month % 12 + 1, 1)
+
+
+def create_price_partition(cursor, month):
+    """Create the price_observations partition holding ``month``"""
+    cursor.execute("SELECT ensure_price_partition(%s)", (month,))
+
+
+def create_staging_table(cursor):
+    """Per-session, all-text landing table that COPY writes into"""
+    cursor.execute("SELECT prepare_products_staging()")
+
+
+def merge_staging(cursor, market):
+    """Upsert staged rows into products; returns (inserted, updated)"""
+    cursor.execute("SELECT * FROM merge_products_staging(%s)", (market,))
+    return cursor.fetchone()
+
+
+def observe_staging(cursor, market):
+    """Append a price observation for every staged product; returns the count"""
+    cursor.execute("SELECT observe_products_staging(%s)", (market,))
+    return cursor.fetchone()[0]
+
+
+def finish_load(cursor):
+    """Refresh brand statistics and bump the data version the API caches on"""
+    cursor.execute("SELECT finish_products_load()")